@@ -0,0 +1,102 @@
+"""Microbenchmark of the paragraph formatter dispatch.
+
+Compares the table driven `_DoxygenXmlParagraphFormatter.visit` with the
+previous getattr based dispatch, and with explicit branches for the most
+common tags in front of the table, on a synthetic description made of the
+common inline tags.
+
+    python benchmarks/bench_visitor.py [--paras N] [--repeat N]
+"""
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from lxml import etree as ET
+
+from sphinxcontrib.autodoc_doxygen.xmlutils import _DoxygenXmlParagraphFormatter
+
+
+class GetattrFormatter(_DoxygenXmlParagraphFormatter):
+    # the dispatch as it was before the table
+    def visit(self, node):
+        method = 'visit_' + node.tag
+        if self.verbosity > 0: print("[debug] method=%s" % (method))
+        if len(self.math_labels) > 0 and node.tag != 'formula':
+            self.emit_math_labels()
+        visitor = getattr(self, method, self.generic_visit)
+        return visitor(node)
+
+
+class BranchFormatter(_DoxygenXmlParagraphFormatter):
+    # direct calls for ref, computeroutput, emphasis and para, the table for
+    # the rest
+    def visit(self, node):
+        tag = node.tag
+        if self.math_labels and tag != 'formula':
+            self.emit_math_labels()
+        if tag == 'ref':
+            return self.visit_ref(node)
+        if tag == 'computeroutput':
+            return self.visit_computeroutput(node)
+        if tag == 'emphasis':
+            return self.visit_emphasis(node)
+        if tag == 'para':
+            return self.visit_para(node)
+        visitor = self._handlers.get(tag)
+        if visitor is None:
+            return self.generic_visit(node)
+        return visitor(self, node)
+
+
+PARA = ('<para>Computes the <emphasis>density</emphasis> of sea water from '
+        '<computeroutput>T</computeroutput> and <computeroutput>S</computeroutput>, '
+        'see <ref refid="namespacemom__eos_1a%(i)d" kindref="member">calculate_density</ref> '
+        'and <bold>the</bold> <ref refid="namespacemom__eos" kindref="compound">mom_eos</ref> '
+        'module.</para>')
+
+
+def make_description(paras):
+    xml = ''.join(PARA % {'i': i} for i in range(paras))
+    return ET.fromstring('<detaileddescription>%s</detaileddescription>' % xml)
+
+
+def format_with(cls, node):
+    formatter = cls()
+    formatter.generic_visit(node, build_mode='html')
+    return formatter.lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paras', type=int, default=200,
+                        help='number of paragraphs in the description')
+    parser.add_argument('--repeat', type=int, default=7,
+                        help='number of timed runs, the best one is reported')
+    parser.add_argument('--number', type=int, default=20,
+                        help='formatter runs per timed run')
+    args = parser.parse_args()
+
+    node = make_description(args.paras)
+    elements = sum(1 for _ in node.iter())
+    expected = format_with(_DoxygenXmlParagraphFormatter, node)
+    assert format_with(GetattrFormatter, node) == expected
+    assert format_with(BranchFormatter, node) == expected
+
+    # interleave the runs so all see the same machine load, keep the best
+    variants = (('getattr', GetattrFormatter), ('table', _DoxygenXmlParagraphFormatter),
+                ('branches', BranchFormatter))
+    results = dict((name, float('inf')) for name, _ in variants)
+    for _ in range(args.repeat):
+        for name, cls in variants:
+            t = timeit.timeit(lambda: format_with(cls, node), number=args.number)
+            results[name] = min(results[name], t / args.number)
+    for name, _ in variants:
+        print('%-9s %8.3f ms per description, %6.2f us per element'
+              % (name, results[name] * 1e3, results[name] / elements * 1e6))
+    print('speedup  %.2fx over getattr, %.2fx over branches'
+          % (results['getattr'] / results['table'], results['branches'] / results['table']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""Synthetic doxygen XML corpus for scaling benchmarks.
+
+Writes Fortran flavoured doxygen XML (modules as namespaces, derived types,
+module functions, related pages) of any size, with an index.xml listing
+every compound and member, plus a small Sphinx project using it::
+
+    python benchmarks/corpus.py OUTDIR --modules 2000 --functions 20
+
+creates OUTDIR/xml and OUTDIR/src (whose conf.py points at ../xml). The
+output only depends on the parameters and the seed.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import random
+
+DEFAULTS = {
+    'modules': 100,         # modules (doxygen namespaces)
+    'functions': 10,        # functions per module
+    'types': 2,             # derived types per module
+    'refs': 3,              # refs per function description paragraph
+    'formulas': 1,          # formulas per function description
+    'tables': 1,            # tables per module description
+    'pages': 10,            # related pages
+    'page_paras': 20,       # paragraphs per page
+    'seed': 0,
+}
+
+HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+DOXYGEN = ('<doxygen xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+           'xsi:noNamespaceSchemaLocation="compound.xsd" version="1.8.13">\n%s\n</doxygen>\n')
+
+CONF = '''import os
+
+extensions = ['sphinxcontrib.autodoc_doxygen']
+master_doc = 'index'
+exclude_patterns = ['_build']
+autosummary_generate = ['index.rst']
+autosummary_toctree = 'api'
+doxygen_xml = os.path.join(os.path.dirname(__file__), '..', 'xml')
+
+
+def setup(app):
+    app.add_config_value('sphinx_build_mode', 'html', '')
+'''
+
+INDEX_RST = '''Synthetic corpus
+================
+
+.. toctree::
+   :glob:
+
+   api/*
+
+.. autodoxysummary::
+   :toctree: api
+   :generate:
+   :kind: mod
+
+.. autodoxysummary::
+   :toctree: api
+   :generate:
+   :kind: page
+'''
+
+
+def module_name(m):
+    return 'mod_%d' % m
+
+
+def module_id(m):
+    return 'namespacemod__%d' % m
+
+
+def function_id(m, f):
+    return '%s_1a%08x' % (module_id(m), f)
+
+
+def type_name(m, t):
+    return '%s::type_%d' % (module_name(m), t)
+
+
+def type_id(m, t):
+    return 'structmod__%d_1_1type__%d' % (m, t)
+
+
+def page_id(p):
+    return 'page_%d' % p
+
+
+def section_id(p, s):
+    return '%s_1sec_%d' % (page_id(p), s)
+
+
+class Corpus(object):
+
+    def __init__(self, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise TypeError('unknown corpus parameters: %s' % ', '.join(sorted(unknown)))
+        self.params = dict(DEFAULTS, **params)
+        for key, value in self.params.items():
+            setattr(self, key, value)
+        self.random = random.Random(self.seed)
+
+    def random_ref(self):
+        """A <ref> to a random function, type, page or section"""
+        choice = self.random.random()
+        if choice < 0.6:
+            m = self.random.randrange(self.modules)
+            f = self.random.randrange(self.functions)
+            return ('<ref refid="%s" kindref="member">func_%d</ref>'
+                    % (function_id(m, f), f))
+        if choice < 0.8 and self.types:
+            m = self.random.randrange(self.modules)
+            t = self.random.randrange(self.types)
+            return ('<ref refid="%s" kindref="compound">type_%d</ref>'
+                    % (type_id(m, t), t))
+        if self.pages:
+            p = self.random.randrange(self.pages)
+            if choice < 0.9:
+                return '<ref refid="%s" kindref="compound">page %d</ref>' % (page_id(p), p)
+            return ('<ref refid="%s" kindref="member">section</ref>'
+                    % section_id(p, self.random.randrange(self.page_paras or 1)))
+        return '<ref refid="%s" kindref="compound">%s</ref>' % (module_id(0), module_name(0))
+
+    def refs_para(self, text):
+        refs = ', '.join(self.random_ref() for _ in range(self.refs))
+        return '<para>%s See %s and <computeroutput>x = 1</computeroutput>.</para>' % (text, refs)
+
+    def table(self, rows=3, cols=3):
+        lines = ['<table rows="%d" cols="%d">' % (rows, cols)]
+        for r in range(rows):
+            entries = ''.join('<entry thead="%s"><para>cell %d,%d</para></entry>'
+                              % ('yes' if r == 0 else 'no', r, c) for c in range(cols))
+            lines.append('<row>%s</row>' % entries)
+        lines.append('</table>')
+        return ''.join(lines)
+
+    def function(self, m, f):
+        name = 'func_%d' % f
+        kind = 'real function' if f % 2 else 'subroutine'
+        formulas = ''.join('<formula id="%d">$a_%d^2$</formula> ' % (i, i)
+                           for i in range(self.formulas))
+        return '''<memberdef kind="function" id="%(id)s" prot="public" static="no">
+<type>%(kind)s</type>
+<definition>%(kind)s %(module)s::%(name)s</definition>
+<argsstring>(a, b)</argsstring>
+<name>%(name)s</name>
+<param><type>real, intent(in)</type><defname>a</defname></param>
+<param><type>real, intent(out)</type><defname>b</defname></param>
+<briefdescription><para>Computes %(name)s of <emphasis>%(module)s</emphasis>.</para></briefdescription>
+<detaileddescription>%(para)s<para>%(formulas)s</para>
+<para><parameterlist kind="param"><parameteritem><parameternamelist><parametername direction="in">a</parametername></parameternamelist><parameterdescription><para>the input</para></parameterdescription></parameteritem>
+<parameteritem><parameternamelist><parametername direction="out">b</parametername></parameternamelist><parameterdescription><para>the result</para></parameterdescription></parameteritem></parameterlist></para></detaileddescription>
+<inbodydescription></inbodydescription>
+<location file="src/%(module)s.F90" line="%(line)d"/>
+</memberdef>''' % {
+            'id': function_id(m, f), 'kind': kind, 'module': module_name(m), 'name': name,
+            'para': self.refs_para('Details of %s.' % name), 'formulas': formulas,
+            'line': 10 * (f + 1)}
+
+    def module(self, m):
+        types = ''.join('<innerclass refid="%s" prot="public">%s</innerclass>\n'
+                        % (type_id(m, t), type_name(m, t)) for t in range(self.types))
+        functions = '\n'.join(self.function(m, f) for f in range(self.functions))
+        tables = ''.join(self.table() for _ in range(self.tables))
+        return '''<compounddef id="%(id)s" kind="namespace" language="Fortran">
+<compoundname>%(name)s</compoundname>
+%(types)s<sectiondef kind="func">
+%(functions)s
+</sectiondef>
+<briefdescription><para>Module %(name)s.</para></briefdescription>
+<detaileddescription>%(para)s%(tables)s</detaileddescription>
+<location file="src/%(name)s.F90" line="1"/>
+</compounddef>''' % {'id': module_id(m), 'name': module_name(m), 'types': types,
+                     'functions': functions, 'para': self.refs_para('About %s.' % module_name(m)),
+                     'tables': tables}
+
+    def derived_type(self, m, t):
+        return '''<compounddef id="%(id)s" kind="type" prot="public">
+<compoundname>%(name)s</compoundname>
+<sectiondef kind="public-attrib">
+<memberdef kind="variable" id="%(id)s_1a0" prot="public" static="no" mutable="no">
+<type>integer, dimension(:), allocatable</type><definition>integer, dimension(:) n</definition><argsstring></argsstring><name>n</name>
+<briefdescription><para>Number of things</para></briefdescription><detaileddescription></detaileddescription></memberdef>
+</sectiondef>
+<briefdescription><para>Derived type %(t)d of %(module)s.</para></briefdescription>
+<detaileddescription></detaileddescription>
+</compounddef>''' % {'id': type_id(m, t), 'name': type_name(m, t), 't': t,
+                     'module': module_name(m)}
+
+    def page(self, p):
+        sections = ''.join('<sect1 id="%s"><title>Section %d</title>%s</sect1>\n'
+                           % (section_id(p, s), s, self.refs_para('Paragraph %d.' % s))
+                           for s in range(self.page_paras))
+        return '''<compounddef id="%(id)s" kind="page">
+<compoundname>%(id)s</compoundname>
+<title>Page %(p)d</title>
+<briefdescription></briefdescription>
+<detaileddescription>%(sections)s</detaileddescription>
+</compounddef>''' % {'id': page_id(p), 'p': p, 'sections': sections}
+
+    def index(self):
+        lines = ['<doxygenindex version="1.8.13">']
+        for m in range(self.modules):
+            lines.append('<compound refid="%s" kind="namespace"><name>%s</name>'
+                         % (module_id(m), module_name(m)))
+            for f in range(self.functions):
+                lines.append('<member refid="%s" kind="function"><name>func_%d</name></member>'
+                             % (function_id(m, f), f))
+            lines.append('</compound>')
+            for t in range(self.types):
+                lines.append('<compound refid="%s" kind="type"><name>%s</name>'
+                             '<member refid="%s_1a0" kind="variable"><name>n</name></member>'
+                             '</compound>' % (type_id(m, t), type_name(m, t), type_id(m, t)))
+        for p in range(self.pages):
+            lines.append('<compound refid="%s" kind="page"><name>%s</name></compound>'
+                         % (page_id(p), page_id(p)))
+        lines.append('</doxygenindex>')
+        return '\n'.join(lines)
+
+    def write(self, outdir):
+        """Write the XML to *outdir*/xml and the Sphinx project to
+        *outdir*/src, returns the number of compounds
+        """
+        xml_dir = os.path.join(outdir, 'xml')
+        src_dir = os.path.join(outdir, 'src')
+        for path in (xml_dir, src_dir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        def write_compound(refid, xml):
+            with open(os.path.join(xml_dir, refid + '.xml'), 'w') as f:
+                f.write(HEADER + DOXYGEN % xml)
+
+        count = 0
+        for m in range(self.modules):
+            write_compound(module_id(m), self.module(m))
+            count += 1
+            for t in range(self.types):
+                write_compound(type_id(m, t), self.derived_type(m, t))
+                count += 1
+        for p in range(self.pages):
+            write_compound(page_id(p), self.page(p))
+            count += 1
+        with open(os.path.join(xml_dir, 'index.xml'), 'w') as f:
+            f.write(HEADER + self.index() + '\n')
+
+        with open(os.path.join(src_dir, 'conf.py'), 'w') as f:
+            f.write(CONF)
+        with open(os.path.join(src_dir, 'index.rst'), 'w') as f:
+            f.write(INDEX_RST)
+        return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('outdir')
+    for key, value in DEFAULTS.items():
+        parser.add_argument('--' + key.replace('_', '-'), type=int, default=value,
+                            dest=key, help='(default %d)' % value)
+    args = vars(parser.parse_args(argv))
+    outdir = args.pop('outdir')
+    count = Corpus(**args).write(outdir)
+    print('[corpus] wrote %d compounds to %s' % (count, outdir))
+
+
+if __name__ == '__main__':
+    main()
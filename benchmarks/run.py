@@ -0,0 +1,321 @@
+"""Benchmark suite over the bundled OpenMM doxygen XML.
+
+Unpacks ``examples/openmm-doxygen-xml.tar.bz2`` next to a copy of
+``examples/openmm`` in a temporary directory and times each phase of a
+build separately:
+
+load           set_doxygen_xml, parsing all the XML (cache disabled)
+load_cached    set_doxygen_xml, restored from the on-disk XML cache
+import_by_name resolving every compound and member name
+format         format_xml_paragraph over every description (memo disabled)
+stubs          generate_autosummary_docs for autodoxysummary.rst
+build          a full ``sphinx-build -b html`` of the example, in a subprocess
+
+The results are written as JSON and compared against a baseline written by
+an earlier run::
+
+    python benchmarks/run.py --save-baseline baseline.json
+    ... change things ...
+    python benchmarks/run.py --baseline baseline.json --output results.json
+
+The exit status is 1 when a phase got slower than the baseline by more than
+``--tolerance``. Everything runs offline.
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = os.path.join(os.path.dirname(HERE), 'examples')
+TARBALL = os.path.join(EXAMPLES, 'openmm-doxygen-xml.tar.bz2')
+
+# sphinx_build_mode is normally registered by the project's own conf.py
+CONF_EXTRA = '''
+
+def setup(app):
+    app.add_config_value('sphinx_build_mode', 'html', '')
+'''
+
+# keep the phases independent of each other's caches
+CONF_OVERRIDES = {
+    'autosummary_generate': False,
+    'doxygen_xml_cache': False,
+    'doxygen_fragment_cache': False,
+}
+
+PHASES = ('load', 'load_cached', 'import_by_name', 'format', 'stubs', 'build')
+
+
+def setup_corpus(workdir, tarball=TARBALL, example=os.path.join(EXAMPLES, 'openmm')):
+    """Unpack the doxygen XML and copy the example project into *workdir*,
+    returns the source directory of the project (its conf.py expects the XML
+    in ../xml)
+    """
+    with tarfile.open(tarball) as tar:
+        tar.extractall(workdir)
+    srcdir = os.path.join(workdir, 'src')
+    shutil.copytree(example, srcdir)
+    with open(os.path.join(srcdir, 'conf.py'), 'a') as f:
+        f.write(CONF_EXTRA)
+    return srcdir
+
+
+def make_app(srcdir, outdir):
+    from sphinx.application import Sphinx
+    with quiet():
+        return Sphinx(srcdir, srcdir, os.path.join(outdir, 'html'),
+                      os.path.join(outdir, 'doctrees'), 'html',
+                      confoverrides=dict(CONF_OVERRIDES), status=None,
+                      warning=io.StringIO(), freshenv=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    # the extension reports its progress with print()
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def time_runs(func, repeat):
+    """Call *func* *repeat* times, returns the timings and the last result"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with quiet():
+            result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def summarize(times, **extra):
+    entry = {
+        'best': min(times),
+        'mean': sum(times) / len(times),
+        'runs': times,
+    }
+    entry.update(extra)
+    return entry
+
+
+def bench_load(app, repeat):
+    from sphinxcontrib.autodoc_doxygen import set_doxygen_xml, get_doxygen_root
+    app.config.doxygen_xml_cache = False
+    times, _ = time_runs(lambda: set_doxygen_xml(app), repeat)
+    return summarize(times, count=len(get_doxygen_root()))
+
+
+def bench_load_cached(app, repeat):
+    from sphinxcontrib.autodoc_doxygen import set_doxygen_xml, get_doxygen_root
+    app.config.doxygen_xml_cache = True
+    try:
+        with quiet():
+            set_doxygen_xml(app)  # writes the cache
+        times, _ = time_runs(lambda: set_doxygen_xml(app), repeat)
+    finally:
+        app.config.doxygen_xml_cache = False
+    return summarize(times, count=len(get_doxygen_root()))
+
+
+def all_names(root):
+    """Every compound name and ``compound::member`` name of the XML"""
+    names = []
+    for compound in root.iterfind('compounddef'):
+        compound_name = compound.findtext('compoundname')
+        names.append(compound_name)
+        for member in compound.iterfind('sectiondef/memberdef'):
+            names.append('%s::%s' % (compound_name, member.findtext('name')))
+    return names
+
+
+def bench_import_by_name(app, repeat):
+    from sphinxcontrib.autodoc_doxygen import get_doxygen_root
+    from sphinxcontrib.autodoc_doxygen.autosummary import import_by_name
+    names = all_names(get_doxygen_root())
+
+    def resolve():
+        failed = 0
+        for name in names:
+            try:
+                import_by_name(name)
+            except ImportError:
+                failed += 1
+        return failed
+
+    times, failed = time_runs(resolve, repeat)
+    return summarize(times, count=len(names), errors=failed)
+
+
+def bench_format(app, repeat):
+    from sphinxcontrib.autodoc_doxygen import get_doxygen_root
+    from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, format_cache
+    nodes = list(get_doxygen_root().iter('briefdescription', 'detaileddescription'))
+
+    def format_all():
+        errors = 0
+        for node in nodes:
+            try:
+                format_xml_paragraph(node, 'html')
+            except Exception:
+                errors += 1
+        return errors
+
+    maxsize = format_cache.maxsize
+    format_cache.clear(0)
+    try:
+        times, errors = time_runs(format_all, repeat)
+    finally:
+        format_cache.clear(maxsize)
+    return summarize(times, count=len(nodes), errors=errors)
+
+
+def bench_stubs(app, repeat, sources=('autodoxysummary.rst',), toctree='generated'):
+    from sphinxcontrib.autodoc_doxygen.autosummary.generate import generate_autosummary_docs
+    outdir = os.path.join(app.srcdir, toctree)
+
+    def generate():
+        # existing stubs are skipped, start from scratch every time
+        shutil.rmtree(outdir, ignore_errors=True)
+        generate_autosummary_docs(list(sources), builder=app.builder, suffix='.rst',
+                                  base_path=app.srcdir, toctree=toctree,
+                                  build_mode='html')
+        return len(os.listdir(outdir)) if os.path.isdir(outdir) else 0
+
+    times, count = time_runs(generate, repeat)
+    return summarize(times, count=count)
+
+
+def bench_build(srcdir, workdir, repeat):
+    times = []
+    returncode = None
+    for i in range(repeat):
+        outdir = os.path.join(workdir, 'build-%d' % i)
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-m', 'sphinx', '-q', '-b', 'html',
+                               srcdir, outdir],
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        times.append(time.perf_counter() - start)
+        returncode = proc.returncode
+        if returncode != 0:
+            # a failed build is reported, but its timing isn't comparable
+            output = proc.stdout.decode('utf-8', 'replace').strip().splitlines()
+            return summarize(times, ok=False, error='\n'.join(output[-5:]))
+        # don't let the next run reuse the generated stubs
+        shutil.rmtree(os.path.join(srcdir, 'generated'), ignore_errors=True)
+    return summarize(times, ok=True)
+
+
+def run_phases(srcdir, workdir, phases, repeat):
+    app = make_app(srcdir, os.path.join(workdir, 'app'))
+    results = {}
+    for phase in phases:
+        print('[benchmark] %s...' % phase, end=' ')
+        sys.stdout.flush()
+        try:
+            if phase == 'build':
+                entry = bench_build(srcdir, workdir, repeat)
+            else:
+                entry = globals()['bench_' + phase](app, repeat)
+        except Exception as e:
+            entry = {'ok': False, 'error': '%s: %s' % (type(e).__name__, e)}
+        entry.setdefault('ok', True)
+        results[phase] = entry
+        if entry['ok']:
+            print('%.3fs' % entry['best'])
+        else:
+            print('failed')
+    return results
+
+
+def environment():
+    import lxml.etree
+    import sphinx
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sphinx': sphinx.__display_version__,
+        'lxml': '.'.join(str(v) for v in lxml.etree.LXML_VERSION),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the phases next to the baseline, returns the names of the
+    phases that got slower by more than *tolerance*
+    """
+    regressions = []
+    print('%-15s %10s %10s %8s' % ('phase', 'baseline', 'current', 'ratio'))
+    for phase, entry in results['phases'].items():
+        base = baseline.get('phases', {}).get(phase)
+        if not entry['ok'] or base is None or not base.get('ok'):
+            print('%-15s %10s %10s %8s' % (phase, '-', '-', 'n/a'))
+            continue
+        ratio = entry['best'] / base['best']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(phase)
+        print('%-15s %9.3fs %9.3fs %7.2fx%s' % (phase, base['best'], entry['best'], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per phase, the best one is compared')
+    parser.add_argument('--phases', default=','.join(PHASES),
+                        help='comma separated phases to run (default: all)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--save-baseline', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown before a phase is a regression (default 0.2)')
+    parser.add_argument('--keep', action='store_true',
+                        help="don't delete the temporary working directory")
+    args = parser.parse_args(argv)
+
+    phases = [p for p in args.phases.split(',') if p]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error('unknown phases: %s' % ', '.join(sorted(unknown)))
+
+    workdir = tempfile.mkdtemp(prefix='autodoc_doxygen_bench_')
+    try:
+        srcdir = setup_corpus(workdir)
+        results = {
+            'corpus': os.path.basename(TARBALL),
+            'repeat': args.repeat,
+            'environment': environment(),
+            'phases': run_phases(srcdir, workdir, phases, args.repeat),
+        }
+    finally:
+        if args.keep:
+            print('[benchmark] working directory kept in %s' % workdir)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
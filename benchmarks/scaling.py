@@ -0,0 +1,215 @@
+"""Scaling benchmark over synthetic corpora of increasing size.
+
+For every size a corpus is generated with `corpus.Corpus` and, in a fresh
+process, set_doxygen_xml, the formatting of every description (which is
+dominated by visit_ref) and generate_autosummary_docs are timed, along with
+the peak memory of the process::
+
+    python benchmarks/scaling.py --sizes 100,200,400,800 --output scaling.json --plot scaling.png
+
+The growth exponent between two sizes is printed for every phase: about 1
+is linear, anything well above that is a hot path that will hurt on large
+projects. Plotting needs matplotlib, everything else runs offline with the
+extension's own requirements.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from corpus import Corpus, DEFAULTS
+from run import make_app, time_runs, summarize
+
+PHASES = ('load', 'format', 'stubs')
+
+# exponents above this are reported as super-linear
+SUPERLINEAR = 1.3
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, None if unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024.
+
+
+def measure(outdir, repeat):
+    """Time the phases over the corpus in *outdir*, in this process"""
+    from sphinxcontrib.autodoc_doxygen import set_doxygen_xml, get_doxygen_root
+    from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, format_cache
+    from sphinxcontrib.autodoc_doxygen.autosummary.generate import generate_autosummary_docs
+
+    srcdir = os.path.join(outdir, 'src')
+    app = make_app(srcdir, os.path.join(outdir, 'build'))
+    results = {}
+
+    times, _ = time_runs(lambda: set_doxygen_xml(app), repeat)
+    results['load'] = summarize(times, memory=peak_memory_mb())
+
+    nodes = list(get_doxygen_root().iter('briefdescription', 'detaileddescription'))
+    format_cache.clear(0)
+
+    def format_all():
+        for node in nodes:
+            format_xml_paragraph(node, 'html')
+
+    times, _ = time_runs(format_all, repeat)
+    results['format'] = summarize(times, count=len(nodes), memory=peak_memory_mb())
+
+    api = os.path.join(srcdir, 'api')
+
+    def generate():
+        shutil.rmtree(api, ignore_errors=True)
+        generate_autosummary_docs(['index.rst'], builder=app.builder, suffix='.rst',
+                                  base_path=srcdir, toctree='api', build_mode='html')
+        return len(os.listdir(api))
+
+    times, count = time_runs(generate, repeat)
+    results['stubs'] = summarize(times, count=count, memory=peak_memory_mb())
+    return results
+
+
+def run_size(modules, params, repeat, workdir):
+    """Generate a corpus with *modules* modules and measure it in a
+    subprocess, so the memory figures aren't polluted by other sizes
+    """
+    outdir = os.path.join(workdir, 'corpus-%d' % modules)
+    corpus_params = dict(params, modules=modules)
+    compounds = Corpus(**corpus_params).write(outdir)
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--measure', outdir,
+             '--repeat', str(repeat)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+    entry = json.loads(proc.stdout.decode('utf-8').strip().splitlines()[-1])
+    entry.update({'modules': modules, 'compounds': compounds, 'params': corpus_params})
+    return entry
+
+
+def exponent(t1, t2, n1, n2):
+    if t1 <= 0 or t2 <= 0 or n1 == n2:
+        return float('nan')
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def report(results):
+    """Print one row per size, with the growth exponent from the previous
+    size for each phase
+    """
+    header = '%8s %10s' % ('modules', 'compounds')
+    for phase in PHASES:
+        header += ' %10s %6s' % (phase, 'exp')
+    header += ' %10s' % 'peak MB'
+    print(header)
+    previous = None
+    superlinear = set()
+    for entry in results:
+        row = '%8d %10d' % (entry['modules'], entry['compounds'])
+        for phase in PHASES:
+            best = entry['phases'][phase]['best']
+            if previous is None:
+                row += ' %9.3fs %6s' % (best, '')
+            else:
+                e = exponent(previous['phases'][phase]['best'], best,
+                             previous['compounds'], entry['compounds'])
+                row += ' %9.3fs %6.2f' % (best, e)
+                if e > SUPERLINEAR:
+                    superlinear.add(phase)
+        memory = entry['phases']['stubs'].get('memory')
+        row += ' %10s' % ('%.1f' % memory if memory is not None else '-')
+        print(row)
+        previous = entry
+    for phase in sorted(superlinear):
+        print('[scaling] %s grows faster than linearly (exponent > %.1f)' % (phase, SUPERLINEAR))
+
+
+def plot(results, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print('[scaling] matplotlib is not installed, not writing %s' % path)
+        return
+
+    sizes = [entry['compounds'] for entry in results]
+    fig, (ax_time, ax_mem) = plt.subplots(1, 2, figsize=(11, 4.5))
+    for phase in PHASES:
+        ax_time.loglog(sizes, [entry['phases'][phase]['best'] for entry in results],
+                       marker='o', label=phase)
+    # linear reference through the first point of the slowest phase
+    first = max(results[0]['phases'][phase]['best'] for phase in PHASES)
+    ax_time.loglog(sizes, [first * s / sizes[0] for s in sizes], 'k:', label='linear')
+    ax_time.set_xlabel('compounds')
+    ax_time.set_ylabel('time (s)')
+    ax_time.legend()
+
+    memory = [entry['phases']['stubs'].get('memory') for entry in results]
+    if None not in memory:
+        ax_mem.plot(sizes, memory, marker='o')
+    ax_mem.set_xlabel('compounds')
+    ax_mem.set_ylabel('peak memory (MB)')
+    fig.tight_layout()
+    fig.savefig(path)
+    print('[scaling] wrote %s' % path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='50,100,200,400',
+                        help='comma separated numbers of modules (default 50,100,200,400)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per phase, the best one is reported')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--plot', help='plot time and memory against size to this image')
+    parser.add_argument('--measure', metavar='CORPUS', help=argparse.SUPPRESS)
+    for key, value in DEFAULTS.items():
+        if key != 'modules':
+            parser.add_argument('--' + key.replace('_', '-'), type=int, default=value,
+                                dest=key, help='corpus parameter (default %d)' % value)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        # worker: print the results of one corpus as the last line
+        print(json.dumps(measure(args.measure, args.repeat)))
+        return 0
+
+    params = dict((key, getattr(args, key)) for key in DEFAULTS if key != 'modules')
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    workdir = tempfile.mkdtemp(prefix='autodoc_doxygen_scaling_')
+    results = []
+    try:
+        for modules in sorted(sizes):
+            print('[scaling] %d modules...' % modules)
+            sys.stdout.flush()
+            entry = run_size(modules, params, args.repeat, workdir)
+            entry['phases'] = dict((phase, entry.pop(phase)) for phase in PHASES)
+            results.append(entry)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.plot:
+        plot(results, args.plot)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,16 @@ import os.path
 from lxml import etree as ET
 from sphinx.errors import ExtensionError
 
+from . import cache, instrument, prebuilt, profiling, sqlstore, tracing
+from .fragments import FragmentCache
+from .index import DoxygenIndex, description_flags
+from .lazy import LazyCompounds
+from .loader import list_xml_files, parse_xml_files
+from .sqlstore import SqliteCompounds
 
+
+@instrument.timed('load_xml')
+@tracing.traced('set_doxygen_xml')
 def set_doxygen_xml(app):
     """Load all doxygen XML files from the app config variable
     `app.config.doxygen_xml` which should be a path to a directory
@@ -12,20 +21,220 @@ def set_doxygen_xml(app):
         '[sphinxcontrib-autodoc_doxygen] No doxygen '
         'xml output found in doxygen_xml="%s"' % app.config.doxygen_xml)
 
+    if not os.path.isdir(app.config.doxygen_xml) and not app.config.doxygen_xml_index:
+        raise err
+
+    # the memoized paragraphs refer to elements of the previous tree
+    from .xmlutils import format_cache, formatter_version
+    format_cache.clear(app.config.doxygen_format_cache_size)
+    format_cache.store = None
+    if app.config.doxygen_fragment_cache:
+        format_cache.store = FragmentCache(
+            os.path.join(app.doctreedir, 'autodoc_doxygen.fragments'), formatter_version())
+        format_cache.store.load()
+
+    setup.DOXYGEN_COMPOUNDS = None
+    # the directory the eager tree was parsed from, None if it came from
+    # somewhere else (see `get_doxygen_xml_dir`)
+    setup.DOXYGEN_XML_DIR = None
+    if app.config.doxygen_xml_mode == 'lazy':
+        # only read the index, compounds are parsed when first needed
+        index_file = os.path.join(app.config.doxygen_xml, 'index.xml')
+        if not os.path.isfile(index_file):
+            raise ExtensionError(
+                '[sphinxcontrib-autodoc_doxygen] doxygen_xml_mode="lazy" needs '
+                'the doxygen index.xml in doxygen_xml="%s"' % app.config.doxygen_xml)
+        root = ET.ElementTree(ET.Element('root')).getroot()
+        for node in ET.parse(index_file).getroot():
+            root.append(node)
+        setup.DOXYGEN_ROOT = root
+        setup.DOXYGEN_COMPOUNDS = LazyCompounds(
+            app.config.doxygen_xml, root, maxsize=app.config.doxygen_xml_lazy_cache_size)
+        print('[autodoc_doxygen] lazy loading %d compounds from %s'
+              % (len(setup.DOXYGEN_COMPOUNDS.kinds), index_file))
+        return
+    elif app.config.doxygen_xml_mode not in ('eager', 'sqlite'):
+        raise ExtensionError(
+            '[sphinxcontrib-autodoc_doxygen] unknown doxygen_xml_mode="%s", '
+            'expected "eager", "lazy" or "sqlite"' % app.config.doxygen_xml_mode)
+
+    if app.config.doxygen_xml_index and app.config.doxygen_xml_mode == 'eager':
+        root = load_xml_index(os.path.join(app.confdir, app.config.doxygen_xml_index),
+                              app.config.doxygen_xml)
+        if root is not None:
+            setup.DOXYGEN_ROOT = root
+            with instrument.phase('build_index'):
+                setup.DOXYGEN_INDEX = DoxygenIndex(root)
+            return
     if not os.path.isdir(app.config.doxygen_xml):
         raise err
 
-    files = [os.path.join(app.config.doxygen_xml, f)
-             for f in os.listdir(app.config.doxygen_xml)
-             if f.lower().endswith('.xml') and not f.startswith('._')]
+    files = list_xml_files(app.config.doxygen_xml)
     if len(files) == 0:
         raise err
 
-    setup.DOXYGEN_ROOT = ET.ElementTree(ET.Element('root')).getroot()
-    for file in files:
-        root = ET.parse(file).getroot()
-        for node in root:
-            setup.DOXYGEN_ROOT.append(node)
+    if app.config.doxygen_xml_mode == 'sqlite':
+        # import the XML into a database, compounds are parsed back from it
+        # when first needed
+        db_path = app.config.doxygen_sqlite_db or os.path.join(
+            app.doctreedir, 'autodoc_doxygen.sqlite')
+        db = sqlstore.connect(db_path)
+        try:
+            with instrument.phase('import_xml'):
+                imported = sqlstore.import_xml(db, [os.path.abspath(f) for f in files])
+        finally:
+            db.close()
+        compounds = SqliteCompounds(db_path, maxsize=app.config.doxygen_xml_lazy_cache_size)
+        setup.DOXYGEN_ROOT = compounds.index_root()
+        setup.DOXYGEN_COMPOUNDS = compounds
+        print('[autodoc_doxygen] %d compounds in %s, %d files imported'
+              % (compounds.count(), db_path, imported))
+        return
+
+    cache_file = None
+    if app.config.doxygen_xml_cache:
+        cache_file = os.path.join(app.doctreedir, 'autodoc_doxygen.cache')
+
+    setup.DOXYGEN_ROOT = load_doxygen_xml(files, cache_file=cache_file)
+    with instrument.phase('build_index'):
+        setup.DOXYGEN_INDEX = DoxygenIndex(setup.DOXYGEN_ROOT)
+    setup.DOXYGEN_XML_DIR = app.config.doxygen_xml
+
+
+def load_xml_index(path, xml_dir):
+    """The merged root element of the prebuilt index *path* (see
+    prebuilt.py), or None if it can't be used for the XML in *xml_dir*.
+    Without the XML directory the index is used as it is.
+    """
+    data = prebuilt.read_index(path)
+    if data is None:
+        print('[autodoc_doxygen] no usable index in %s, parsing the xml' % path)
+        return None
+    if os.path.isdir(xml_dir) and not prebuilt.matches(data, xml_dir):
+        print('[autodoc_doxygen] index %s was built from other xml, parsing the xml' % path)
+        return None
+    with instrument.phase('restore_xml_index'):
+        root = prebuilt.restore_root(data)
+    print('[autodoc_doxygen] restored %d files from index %s' % (len(data['files']), path))
+    return root
+
+
+def load_doxygen_xml(files, cache_file=None):
+    """Parse the doxygen XML *files* and merge the children of each
+    document under a single root element, which is returned.
+
+    If *cache_file* is given, the merged tree is restored from it when
+    none of the files changed since it was written, and the cache is
+    rewritten otherwise.
+    """
+    if cache_file is None:
+        instrument.count('xml.files_parsed', len(files))
+        with instrument.phase('parse_xml'):
+            return parse_xml_files(files)[0]
+
+    files = [os.path.abspath(f) for f in files]
+    data = cache.read_cache(cache_file)
+    if data is not None:
+        manifest = cache.check_manifest(data['manifest'], files)
+        if manifest is not None:
+            print('[autodoc_doxygen] xml cache hit: restored %d files from %s'
+                  % (len(files), cache_file))
+            instrument.count('xml_cache.hit')
+            with instrument.phase('restore_xml_cache'):
+                root = cache.restore_root(data)
+            if manifest != data['manifest']:
+                # only mtimes changed, remember them to skip hashing next time
+                cache.write_cache(cache_file, manifest, root)
+            return root
+        print('[autodoc_doxygen] xml cache miss: doxygen xml changed, parsing %d files'
+              % len(files))
+    else:
+        print('[autodoc_doxygen] xml cache miss: no cache, parsing %d files' % len(files))
+
+    instrument.count('xml_cache.miss')
+    instrument.count('xml.files_parsed', len(files))
+    with instrument.phase('parse_xml'):
+        root, manifest = parse_xml_files(files, with_digest=True)
+    cache.write_cache(cache_file, manifest, root)
+    return root
+
+
+def save_fragment_cache(app, exception):
+    """Write the formatted descriptions back to the fragment cache"""
+    from .xmlutils import format_cache
+    store = format_cache.store
+    if exception is not None or store is None:
+        return
+    print('[autodoc_doxygen] fragment cache: %d reused, %d formatted'
+          % (store.hits, store.misses))
+    store.save()
+
+
+def init_instrumentation(app, config):
+    """Turn the instrumentation and the profiler on for this build if
+    asked for
+    """
+    instrument.enable(bool(config.doxygen_instrument))
+    instrument.reset()
+    profiling.enable(config.doxygen_profile)
+    if config.doxygen_trace:
+        tracing.enable(os.path.join(app.outdir, '_trace'))
+    else:
+        tracing.disable()
+
+
+def report_instrumentation(app, exception):
+    """Print the time spent in each phase and the counters, and write them
+    to `doxygen_instrument_json` if set
+    """
+    if not instrument.ENABLED:
+        return
+    from .xmlutils import format_cache
+    extra = {
+        'format_memo.hit': format_cache.hits,
+        'format_memo.miss': format_cache.misses,
+    }
+    if format_cache.store is not None:
+        extra['fragment_cache.hit'] = format_cache.store.hits
+        extra['fragment_cache.miss'] = format_cache.store.misses
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        extra['lazy.hit'] = compounds.hits
+        extra['lazy.miss'] = compounds.misses
+
+    data = instrument.snapshot(extra)
+    print('[autodoc_doxygen] build profile')
+    for line in instrument.format_report(data):
+        print(('[autodoc_doxygen]   ' + line).rstrip())
+    if app.config.doxygen_instrument_json:
+        path = os.path.join(app.outdir, app.config.doxygen_instrument_json)
+        instrument.write_json(data, path)
+        print('[autodoc_doxygen] build profile written to %s' % path)
+
+
+def save_profiles(app, exception):
+    """Write the profiles of the `doxygen_profile` calls and print the
+    hottest functions
+    """
+    if not profiling.labels():
+        return
+    outdir = os.path.join(app.outdir, '_profile')
+    lines = profiling.dump(outdir, top=app.config.doxygen_profile_top)
+    print('[autodoc_doxygen] %d profiles written to %s'
+          % (len(profiling.labels()), outdir))
+    for line in lines:
+        print(('[autodoc_doxygen]   ' + line).rstrip())
+
+
+def write_trace(app, exception):
+    """Merge the spans of the main process and of the workers into the
+    `doxygen_trace` file
+    """
+    if not tracing.ENABLED:
+        return
+    path = os.path.join(app.outdir, app.config.doxygen_trace)
+    count = tracing.merge(path)
+    print('[autodoc_doxygen] trace of %d spans written to %s' % (count, path))
 
 
 def get_doxygen_root():
@@ -36,6 +245,116 @@ def get_doxygen_root():
     return setup.DOXYGEN_ROOT
 
 
+def get_doxygen_index():
+    """Get the `DoxygenIndex` of the root element, which is built when the
+    XML is loaded or when the root element was replaced.
+    """
+    root = get_doxygen_root()
+    index = getattr(setup, 'DOXYGEN_INDEX', None)
+    if index is None or index.root is not root:
+        index = setup.DOXYGEN_INDEX = DoxygenIndex(root)
+    return index
+
+
+def get_doxygen_xml_dir():
+    """Get the directory the loaded doxygen XML tree was parsed from, None
+    in lazy and sqlite mode or when it was restored from a prebuilt index.
+    """
+    return getattr(setup, 'DOXYGEN_XML_DIR', None)
+
+
+def get_doxygen_compounds():
+    """Get the `LazyCompounds` loader in lazy mode, None when all the
+    doxygen XML is loaded in the root element.
+    """
+    return getattr(setup, 'DOXYGEN_COMPOUNDS', None)
+
+
+def _count_lookup(result):
+    if instrument.ENABLED:
+        # elements are falsy when they have no children, test for None
+        found = len(result) > 0 if isinstance(result, list) else result is not None
+        instrument.count('index.hit' if found else 'index.miss')
+    return result
+
+
+def find_compounddef(refid):
+    """Get the <compounddef> with id *refid*, or None.
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        return _count_lookup(compounds.get(refid))
+    return _count_lookup(get_doxygen_index().find_compounddef(refid))
+
+
+def find_compounddefs_by_name(name):
+    """Get the list of <compounddef> whose compoundname is *name*.
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        return _count_lookup(compounds.get_by_name(name))
+    return _count_lookup(get_doxygen_index().find_by_name(name))
+
+
+def find_members(compound_name, name, kind='function', section='func'):
+    """Get the list of <memberdef kind="*kind*"> named *name* in the
+    <sectiondef kind="*section*"> of the compounds named *compound_name*,
+    in document order (so overloads can be picked by position).
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        return _count_lookup(compounds.find_members(compound_name, name, kind=kind, section=section))
+    return _count_lookup(get_doxygen_index().find_members(compound_name, name, kind=kind, section=section))
+
+
+def find_elements_by_id(refid):
+    """Get the list of elements anywhere in the doxygen XML with id *refid*.
+    The list is shared, don't modify it.
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        return _count_lookup(compounds.find_id(refid))
+    return _count_lookup(get_doxygen_index().find_id(refid))
+
+
+def find_compound_id(refid):
+    """Get the id of the compound that defines the element *refid*, or
+    None. In lazy mode the compound isn't loaded for that.
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        return compounds.compound_of(refid)
+    elements = get_doxygen_index().find_id(refid)
+    if not elements:
+        return None
+    node = elements[0]
+    if node.tag != 'compounddef':
+        node = next(node.iterancestors('compounddef'), None)
+    return node.get('id') if node is not None else None
+
+
+def get_description_flags(node):
+    """Get the feature flags (`index.LATEXONLY`, ...) of the description
+    *node*, precomputed when the XML was loaded.
+    """
+    compounds = get_doxygen_compounds()
+    if compounds is not None:
+        compound = next(node.iterancestors('compounddef'), None)
+        index = None
+        if compound is not None:
+            index = compounds.loaded.get(compound.get('id'))
+    else:
+        index = get_doxygen_index()
+
+    flags = None
+    if index is not None:
+        flags = index.find_flags(node)
+    if flags is None:
+        # not a description of the loaded XML
+        flags = description_flags(node)
+    return flags
+
+
 def setup(app):
     import sphinx.ext.autosummary
     # add DoxygenTypeDocumenter and DoxygenModuleDocumenter
@@ -44,9 +363,23 @@ def setup(app):
             DoxygenTypeDocumenter, DoxygenModuleDocumenter
     from .autosummary import DoxygenAutosummary, DoxygenAutoEnum
     from .autosummary.generate import process_generate_options
+    from . import depends, parallel
 
+    app.connect("config-inited", init_instrumentation)
     app.connect("builder-inited", set_doxygen_xml)
     app.connect("builder-inited", process_generate_options)
+    app.connect("build-finished", save_fragment_cache)
+    app.connect("build-finished", report_instrumentation)
+    app.connect("build-finished", save_profiles)
+    app.connect("build-finished", write_trace)
+    app.connect("env-get-outdated", depends.get_outdated)
+    app.connect("env-updated", depends.update_digests)
+    app.connect("env-purge-doc", depends.purge_doc)
+    app.connect("env-merge-info", depends.merge_info)
+    app.connect("env-before-read-docs", parallel.before_read)
+    app.connect("doctree-read", parallel.collect)
+    app.connect("env-merge-info", parallel.merge_info)
+    app.connect("env-updated", parallel.after_read)
 
     app.setup_extension('sphinx.ext.autodoc')
     app.setup_extension('sphinx.ext.autosummary')
@@ -58,7 +391,47 @@ def setup(app):
     app.add_autodocumenter(DoxygenTypeDocumenter)
     #app.add_config_value("doxygen_xml", "", True)
     # Change to path instead of a flag?
-    app.add_config_value("doxygen_xml", "", 'env')
+    # documents are read again when the compounds they use change, see
+    # depends.py, so a new path doesn't need to rebuild everything
+    app.add_config_value("doxygen_xml", "", '')
+    # load the merged doxygen xml from this file made by autodoc-doxygen-index,
+    # relative to the conf dir; without the xml, documents can't tell which
+    # compounds changed, so another index rebuilds everything
+    app.add_config_value("doxygen_xml_index", '', 'env')
+    # keep a cache of the merged doxygen xml in the doctree directory
+    app.add_config_value("doxygen_xml_cache", True, '')
+    # "eager" loads all the doxygen xml at startup, "lazy" only index.xml,
+    # "sqlite" imports it into a database
+    app.add_config_value("doxygen_xml_mode", 'eager', '')
+    # the database of doxygen_xml_mode = "sqlite", in the doctree directory
+    # if empty
+    app.add_config_value("doxygen_sqlite_db", '', '')
+    # number of compounds kept parsed in lazy and sqlite mode, 0 for no limit
+    app.add_config_value("doxygen_xml_lazy_cache_size", 256, '')
+    # number of formatted descriptions kept in memory, 0 to disable
+    app.add_config_value("doxygen_format_cache_size", 4096, '')
+    # keep the formatted descriptions in the doctree directory between builds
+    app.add_config_value("doxygen_fragment_cache", False, '')
+    # time the phases of the build and print a report when it finishes
+    app.add_config_value("doxygen_instrument", False, '')
+    # also write the report as JSON to this file, relative to the output dir
+    app.add_config_value("doxygen_instrument_json", '', '')
+    # profile the documents and objects matching these patterns
+    app.add_config_value("doxygen_profile", [], '')
+    # number of functions in the merged profile report
+    app.add_config_value("doxygen_profile_top", 20, '')
+    # write a Trace Event Format file of the build to this file, relative
+    # to the output dir
+    app.add_config_value("doxygen_trace", '', '')
+    # with -j, the reading processes load the compounds they need from the
+    # XML files rather than using the tree of the main process
+    app.add_config_value("doxygen_parallel_lazy", True, '')
+    # processes scanning the sources for autodoxysummary directives the scan
+    # cache doesn't have, 0 for one per CPU
+    app.add_config_value("doxygen_scan_workers", 1, '')
+    # processes rendering and writing the autosummary stubs, 0 for one per
+    # CPU
+    app.add_config_value("doxygen_stub_workers", 1, '')
     # Used in sphinxcontrib/autodoc_doxygen/autosummary/generate.py
     app.add_config_value('autosummary_toctree', '', 'html')
 
@@ -7,13 +7,13 @@ import os
 
 # add directives from docutils.parsers.rst
 from docutils.parsers.rst import directives
-from six import itervalues
 from lxml import etree as ET
 # add AutoDirective (depricated)
 from sphinx.ext.autodoc import Documenter, members_option, ALL
 from sphinx.errors import ExtensionError
 
-from . import get_doxygen_root
+from . import get_doxygen_root, find_compounddef, find_compounddefs_by_name, \
+        find_elements_by_id, depends, instrument, profiling, tracing
 # add flatten
 from .xmlutils import format_xml_paragraph, flatten
 
@@ -23,6 +23,54 @@ try:
 except:
     pass
 
+def _trace_args(documenter, *args, **kwargs):
+    return {'name': documenter.name}
+
+
+# documenter class chosen for each member signature, valid as long as the
+# registry holds the documenters in _documenters_seen
+_documenter_cache = {}
+_documenters_seen = None
+
+
+def documenter_resolver(documenters):
+    """Return a function choosing the documenter class for a member, like
+    Documenter.document_members does: the highest priority class among
+    *documenters* whose can_document_member accepts it, or None.
+
+    The choice is cached by (parent documenter class, member tag, member
+    kind, isattr), which is all the registered can_document_member look at
+    for XML members, and the cache is dropped when *documenters* changed.
+    """
+    global _documenters_seen
+    seen = tuple(documenters.items())
+    if seen != _documenters_seen:
+        _documenter_cache.clear()
+        _documenters_seen = seen
+
+    # decreasing priority, ties in reverse registration order, so the first
+    # match is the one the sort in document_members used to end with
+    candidates = sorted(documenters.values(), key=lambda cls: cls.priority)[::-1]
+
+    def select(member, mname, isattr, parent):
+        for cls in candidates:
+            if cls.can_document_member(member, mname, isattr, parent):
+                return cls
+        return None
+
+    def resolve(member, mname, isattr, parent):
+        if not ET.iselement(member):
+            return select(member, mname, isattr, parent)
+        key = (type(parent), member.tag, member.get('kind'), isattr)
+        try:
+            return _documenter_cache[key]
+        except KeyError:
+            cls = _documenter_cache[key] = select(member, mname, isattr, parent)
+            return cls
+
+    return resolve
+
+
 class DoxygenDocumenter(Documenter):
     # Variables to store the names of the object being documented. modname and fullname are redundant,
     # and objpath is always the empty list. This is inelegant, but we need to work with the superclass.
@@ -56,6 +104,20 @@ class DoxygenDocumenter(Documenter):
     def parse_id(self, id):
         return False
 
+    def generate(self, *args, **kwargs):
+        with instrument.phase('documenter.%s' % self.objtype), \
+                tracing.span('%s.generate' % self.objtype, name=self.name):
+            return self.generate_body(*args, **kwargs)
+
+    def generate_body(self, *args, **kwargs):
+        # what generate times, the module documenter writes its own output
+        return super().generate(*args, **kwargs)
+
+    def add_content(self, more_content, *args, **kwargs):
+        # the document has to be read again when this element changes
+        depends.note_element(self.env, self.object)
+        super().add_content(more_content, *args, **kwargs)
+
     def parse_name(self):
         """Determine what module to import and what attribute to document.
         Returns True and sets *self.modname*, *self.objname*, *self.fullname*,
@@ -101,23 +163,21 @@ class DoxygenDocumenter(Documenter):
 
         # document non-skipped members
         memberdocumenters = []
+        # change (AutoDirective is depricated?)
+        #classes = [cls for cls in itervalues(AutoDirective._registry)
+        resolve = documenter_resolver(self.env.app.registry.documenters)
         for (mname, member, isattr) in self.filter_members(members, want_all):
-            # change (AutoDirective is depricated?)
-            #classes = [cls for cls in itervalues(AutoDirective._registry)
-            classes = [cls for cls in itervalues(self.env.app.registry.documenters)
-                       if cls.can_document_member(member, mname, isattr, self)]
-            if not classes:
+            # the documenter with the highest priority
+            cls = resolve(member, mname, isattr, self)
+            if cls is None:
                 # don't know how to document this member
                 continue
 
-            # prefer the documenter with the highest priority
-            classes.sort(key=lambda cls: cls.priority)
-
             # change
             #documenter = classes[-1](self.directive, mname, indent=self.indent, id=member.get('id'))
-            documenter = classes[-1](self.directive, mname, indent=self.indent,
-                                     id=member.get('id'), brief=self.brief,
-                                     parent=self.object)
+            documenter = cls(self.directive, mname, indent=self.indent,
+                             id=member.get('id'), brief=self.brief,
+                             parent=self.object)
             memberdocumenters.append((documenter, isattr))
 
         for documenter, isattr in memberdocumenters:
@@ -164,18 +224,15 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
 
         Returns True if successful, False if an error occurred.
         """
-        # change
-        #xpath_query = './/compoundname[text()="%s"]/..' % self.fullname
-        xpath_query = './compounddef/compoundname[text()="%s"]/..' % self.fullname
-        match = get_doxygen_root().xpath(xpath_query)
+        match = find_compounddefs_by_name(self.fullname)
         if len(match) != 1:
             # change
             #raise ExtensionError('[autodoc_doxygen] could not find class (fullname="%s"). I tried'
-            raise ExtensionError('[autodoc_doxygen] could not find module (fullname="%s"). I tried'
-                                 'the following xpath: "%s"' % (self.fullname, xpath_query))
+            raise ExtensionError('[autodoc_doxygen] could not find module (fullname="%s"), '
+                                 'found %d compounds with that name' % (self.fullname, len(match)))
 
         self.object = match[0]
-        if self.env.app.verbosity > 0: print("[debug] xpath(%s) match(%s)" % (xpath_query,match[0].items()))
+        if self.env.app.verbosity > 0: print("[debug] compoundname(%s) match(%s)" % (self.fullname,match[0].items()))
         return True
 
     # todo: typo: report upstream
@@ -195,6 +252,7 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
     # encoding depricated?
     # called via add_content
     #def get_doc(self, encoding):
+    @tracing.traced('doxymodule.get_doc', _trace_args)
     def get_doc(self):
         if self.brief:
             description = self.object.find('briefdescription')
@@ -247,17 +305,19 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
     #def document_members(self, all_members=False):
     def document_members(self, member_type, all_members=False):
         if member_type == 'func':
+            instrument.count('xpath')
             all_members = self.object.xpath('./sectiondef[@kind="func" '
                 'or @kind="public-static-func"]/memberdef[@kind="function"]')
 
             members = [(m.find('name').text, m) for m in all_members]
 
         elif member_type == 'type':
+            instrument.count('xpath')
             classes = self.object.findall('./innerclass')
             members = []
             for c in classes:
 
-                class_obj = get_doxygen_root().find('./compounddef[@id="%s"]' % c.get('refid'))
+                class_obj = find_compounddef(c.get('refid'))
                 if class_obj.get('kind') == 'type':
                     members.append((class_obj.find('compoundname').text, class_obj))
 
@@ -281,10 +341,14 @@ class DoxygenModuleDocumenter(DoxygenDocumenter):
         self.add_line(char * len(title), sourcename)
         self.add_line(u'', sourcename)
 
+    def generate(self, *args, **kwargs):
+        with profiling.profile('doxymodule', self.name, self.env.docname):
+            return super().generate(*args, **kwargs)
+
     # This generates the autogenerated content for all the module
     # functions
-    def generate(self, more_content=None, real_modname=None,
-                 check_module=False, all_members=False):
+    def generate_body(self, more_content=None, real_modname=None,
+                      check_module=False, all_members=False):
         if not self.parse_name():
             self.directive.warn("don't know which module to import for autodocumenting %r" % self.name)
             return
@@ -368,11 +432,10 @@ class DoxygenClassDocumenter(DoxygenDocumenter):
 
         Returns True if successful, False if an error occurred.
         """
-        xpath_query = './/compoundname[text()="%s"]/..' % self.fullname
-        match = get_doxygen_root().xpath(xpath_query)
+        match = find_compounddefs_by_name(self.fullname)
         if len(match) != 1:
-            raise ExtensionError('[autodoc_doxygen] could not find class (fullname="%s"). I tried'
-                                 'the following xpath: "%s"' % (self.fullname, xpath_query))
+            raise ExtensionError('[autodoc_doxygen] could not find class (fullname="%s"), '
+                                 'found %d compounds with that name' % (self.fullname, len(match)))
 
         self.object = match[0]
         return True
@@ -386,6 +449,7 @@ class DoxygenClassDocumenter(DoxygenDocumenter):
     def format_name(self):
         return self.fullname
 
+    @tracing.traced('doxyclass.get_doc', _trace_args)
     def get_doc(self):
         detaileddescription = self.object.find('detaileddescription')
         # add build_mode and verbosity
@@ -394,6 +458,7 @@ class DoxygenClassDocumenter(DoxygenDocumenter):
         return doc
 
     def get_object_members(self, want_all):
+        instrument.count('xpath')
         all_members = self.object.xpath('.//sectiondef[@kind="public-func" '
             'or @kind="public-static-func"]/memberdef[@kind="function"]')
 
@@ -467,15 +532,18 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
 
     def parse_id(self, id):
         # added
-        # try to search our parent node instead of the entire tree
+        # look the id up in the index, but only accept matches below our
+        # parent node when we have one
         parent = self.parent
-        if parent is None:
-            parent = get_doxygen_root()
-
-        xp = './/*[@id="%s"]' % id
-        # original
-        #match = get_doxygen_root().xpath(xp)
-        match = parent.xpath(xp)
+        match = find_elements_by_id(id)
+        if parent is not None:
+            match = [m for m in match
+                     if any(a is parent for a in m.iterancestors())]
+            if not match:
+                # in lazy mode the parent may come from a compound that has
+                # since been evicted and reloaded, search it directly
+                instrument.count('xpath')
+                match = parent.xpath('.//*[@id="%s"]' % id)
         if len(match) > 0:
             match = match[0]
             self.fullname = match.find('./definition').text.split()[-1]
@@ -501,6 +569,7 @@ class DoxygenMethodDocumenter(DoxygenDocumenter):
                                  'the following xpath: "%s"' % (tuple(self.fullname.rsplit('::', 1)) + (xpath_query,)))
         self.object = match[0]
 
+    @tracing.traced('doxymethod.get_doc', _trace_args)
     def get_doc(self):
         doc = [format_xml_paragraph(self.object.find('briefdescription'), self.env.config.sphinx_build_mode,
             verbosity=self.env.app.verbosity)]
@@ -639,7 +708,7 @@ class DoxygenTypeDocumenter(DoxygenDocumenter):
         return False
 
     def parse_id(self, id):
-        self.object = get_doxygen_root().find('./compounddef[@id="%s"]' % id)
+        self.object = find_compounddef(id)
         self.fullname = self.object.find('compoundname').text
         self.modname, self.objname = self.fullname.rsplit('::')
 
@@ -660,6 +729,7 @@ class DoxygenTypeDocumenter(DoxygenDocumenter):
 
     #def get_doc(self, encoding):
     # encoding is depricated
+    @tracing.traced('doxytype.get_doc', _trace_args)
     def get_doc(self):
         desc = [format_xml_paragraph(self.object.find('briefdescription'),
             self.env.config.sphinx_build_mode, verbosity=self.env.app.verbosity)]
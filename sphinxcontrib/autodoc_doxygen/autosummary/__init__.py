@@ -1,9 +1,6 @@
 from __future__ import print_function, absolute_import, division
 
-import re
-import operator
-from functools import reduce
-from itertools import count, groupby
+from itertools import groupby
 
 from docutils import nodes
 # add directives from docutils.parsers.rst
@@ -12,19 +9,55 @@ from docutils.statemachine import StringList, ViewList
 from sphinx import addnodes
 from sphinx.ext.autosummary import Autosummary, autosummary_table
 
-from .. import get_doxygen_root
+from .. import get_doxygen_root, find_compounddefs_by_name, find_members, depends, \
+        instrument, profiling, tracing
 #from ..autodoc import DoxygenMethodDocumenter, DoxygenClassDocumenter, DoxygenModuleDocumenter
 from ..autodoc import DoxygenMethodDocumenter, DoxygenModuleDocumenter
 from ..xmlutils import format_xml_paragraph
+from .summary import summarize, first_sentence, has_docstring_listeners
 
 
+@instrument.timed('resolve_names')
 def import_by_name(name, env=None, prefixes=None, i=0):
     """Get xml documentation for a class/method with a given name.
     If there are multiple classes or methods with that name, you
     can use the `i` kwarg to pick which one.
     """
-    if prefixes is None:
-        prefixes = [None]
+    match, tried = _resolve(name, name_prefixes(env, prefixes), i=i)
+    if match is None:
+        raise ImportError('no module named %s' % ' or '.join(tried))
+    return match
+
+
+@instrument.timed('resolve_names')
+def resolve_names(names, env=None, prefixes=None):
+    """Resolve all the *names* of an autosummary at once.
+
+    The prefixes are worked out once for the whole list and misses don't
+    raise: for each name, returns ``(name, match, tried)`` where *match* is
+    what `import_by_name` returns, or None if none of the *tried* names
+    resolved. A name repeated on consecutive lines picks the next match
+    each time, like the `i` kwarg of `import_by_name`.
+
+    A leading ``~`` is left out of the lookup and of the returned name, but
+    ``~name`` and ``name`` are still counted apart when they follow each
+    other.
+    """
+    prefixes = name_prefixes(env, prefixes)
+    results = []
+    for key, group in groupby(names):
+        name = key[1:] if key.startswith('~') else key
+        for i, _ in enumerate(group):
+            match, tried = _resolve(name, prefixes, i=i)
+            results.append((name, match, tried))
+    return results
+
+
+def name_prefixes(env=None, prefixes=None):
+    """The prefixes to try, in order, in front of a name: *prefixes*
+    (default: none) then the current C++ scope of *env*
+    """
+    prefixes = list(prefixes) if prefixes is not None else [None]
 
     # angus
     if env is not None:
@@ -44,41 +77,46 @@ def import_by_name(name, env=None, prefixes=None, i=0):
             parent_symbols = [p[0].get_display_string() for p in parents]
             prefixes.append('::'.join(parent_symbols))
 
-    # unmodified
+    # outside of any scope the same name would be looked up several times
+    unique = []
+    for prefix in prefixes:
+        prefix = prefix or None
+        if prefix not in unique:
+            unique.append(prefix)
+    return unique
+
+
+def _resolve(name, prefixes, i=0):
+    # (match, names tried), match is None if no prefixed name resolved
     tried = []
     for prefix in prefixes:
-        try:
-            if prefix:
-                prefixed_name = '::'.join([prefix, name])
-            else:
-                prefixed_name = name
-            return _import_by_name(prefixed_name, i=i)
-        except ImportError:
-            tried.append(prefixed_name)
-    raise ImportError('no module named %s' % ' or '.join(tried))
-
-def _import_by_name(name, i=0):
-    root = get_doxygen_root()
+        if prefix:
+            prefixed_name = '::'.join([prefix, name])
+        else:
+            prefixed_name = name
+        match = _lookup_name(prefixed_name, i=i)
+        if match is not None:
+            return match, tried
+        tried.append(prefixed_name)
+    return None, tried
+
+def _lookup_name(name, i=0):
     name = name.replace('.', '::')
 
     if '::' in name:
-        xpath_query = (
-            './compounddef/compoundname[text()="%s"]/../'
-            'sectiondef[@kind="func"]/memberdef[@kind="function"]/'
-            'name[text()="%s"]/..') % tuple(name.rsplit('::', 1))
-        m = root.xpath(xpath_query)
+        compound_name, member_name = name.rsplit('::', 1)
+        m = find_members(compound_name, member_name)
         if len(m) > 0:
             obj = m[i]
             full_name = '.'.join(name.rsplit('::', 1))
             return full_name, obj, full_name, ''
 
-    xpath_query = ('./compounddef/compoundname[text()="%s"]/..' % name)
-    m = root.xpath(xpath_query)
+    m = find_compounddefs_by_name(name)
     if len(m) > 0:
         obj = m[i]
         return (name, obj, name, '')
 
-    raise ImportError()
+    return None
 
 def _import_by_name_original(name, i=0):
     root = get_doxygen_root()
@@ -157,6 +195,12 @@ class DoxygenAutosummary(Autosummary):
         'generate':     directives.flag,
     }
 
+    def run(self):
+        with instrument.phase('directive.%s' % self.name), \
+                tracing.span(self.name, docname=self.env.docname):
+            return super().run()
+
+    @profiling.profiled('autosummary', lambda self, names: (self.env.docname,) + tuple(names))
     def get_items(self, names):
         """Try to import the given names, and return a list of
         ``[(name, signature, summary_string, real_name), ...]``.
@@ -170,28 +214,44 @@ class DoxygenAutosummary(Autosummary):
             if self.options['kind'] == 'page':
                 return []
 
+            # the table changes when modules come and go
+            depends.note_index(env)
+            instrument.count('xpath')
             modules = get_doxygen_root().xpath('./compound[@kind="namespace"]')
             names = [m.find('name').text for m in modules]
 
         # TODO: silently fail when there are no fortran files provided?
-        try:
-            names_and_counts = reduce(operator.add,
-                [tuple(zip(g, count())) for _, g in groupby(names)]) # type: List[(Str, Int)]
-        except:
+        if not names:
             return items
 
-        for name, i in names_and_counts:
+        display_names = []
+        for name in names:
             display_name = name
             if name.startswith('~'):
-                name = name[1:]
-                display_name = name.split('::')[-1]
-
-            try:
-                real_name, obj, parent, modname = import_by_name(name, env=env, i=i)
-            except ImportError:
+                display_name = name[1:].split('::')[-1]
+            display_names.append(display_name)
+
+        # the rows can be read from the XML unless the docstrings may be
+        # rewritten or the debug output is wanted
+        fast = env.app.verbosity == 0 and not has_docstring_listeners(env.app)
+        build_mode = env.config.sphinx_build_mode
+
+        resolved = resolve_names(names, env=env)
+        for display_name, (name, match, tried) in zip(display_names, resolved):
+            if match is None:
+                # may be there in the next XML
+                depends.note_index(env)
                 self.warn('failed to import %s' % name)
                 items.append((name, '', '', name))
                 continue
+            real_name, obj, parent, modname = match
+            depends.note_element(env, obj)
+
+            row = summarize(obj, real_name, build_mode) if fast else None
+            if row is not None:
+                sig, summary = row
+                items.append((display_name, sig, summary, real_name))
+                continue
 
             # Replace depricated self.result
             self.bridge.result = StringList()  # initialize for each documenter
@@ -215,26 +275,7 @@ class DoxygenAutosummary(Autosummary):
             # -- Grab the summary
             documenter.add_content(None)
             doc = list(documenter.process_doc([self.bridge.result.data]))
-
-            while doc and not doc[0].strip():
-                doc.pop(0)
-
-            # If there's a blank line, then we can assume the first sentence /
-            # paragraph has ended, so anything after shouldn't be part of the
-            # summary
-            for i, piece in enumerate(doc):
-                if not piece.strip():
-                    doc = doc[:i]
-                    break
-
-            # Try to find the "first sentence", which may span multiple lines
-            m = re.search(r"^([A-Z].*?\.)(?:\s|$)", " ".join(doc).strip())
-            if m:
-                summary = m.group(1).strip()
-            elif doc:
-                summary = doc[0].strip()
-            else:
-                summary = ''
+            summary = first_sentence(doc)
 
             items.append((display_name, sig, summary, real_name))
 
@@ -307,6 +348,7 @@ class DoxygenAutoEnum(DoxygenAutosummary):
         self.name = names[0]
 
         real_name, obj, parent, modname = import_by_name(self.name, env=env)
+        depends.note_element(env, obj)
         names = [n.text for n in obj.findall('./enumvalue/name')]
         descriptions = [format_xml_paragraph(d) for d in obj.findall('./enumvalue/detaileddescription')]
         return zip(names, descriptions)
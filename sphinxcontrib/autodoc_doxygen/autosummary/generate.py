@@ -1,32 +1,181 @@
 from __future__ import print_function, absolute_import, division
 
+import argparse
 import codecs
+import hashlib
+import json
 import os
+import pickle
 import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 # add
 import datetime
+from types import SimpleNamespace
 
 from jinja2 import FileSystemLoader
+from lxml import etree as ET
 from jinja2.sandbox import SandboxedEnvironment
+from sphinx.errors import ExtensionError
 from sphinx.jinja2glue import BuiltinTemplateLoader
 from sphinx.util.osutil import ensuredir
 
 #from . import import_by_name
 # add
 from . import import_by_name, get_doxygen_root
-from ..xmlutils import format_xml_paragraph
+from .. import find_compounddef, instrument, profiling, tracing, set_doxygen_xml
+from ..xmlutils import format_xml_paragraph, formatter_version, fragment_key
+
+# Bump this whenever the namespaces handed to the templates or the layout
+# of the manifest change
+STUBS_VERSION = 2
+
+
+def write_stub(fn, template, ns, name):
+    """Render one stub to a temporary file and move it in place, so an
+    interrupted build never leaves a truncated stub behind. A stub whose
+    content didn't change is left alone, to keep its mtime and spare Sphinx
+    from reading it again. Returns True if the file was written.
+    """
+    with tracing.span('stub', name=name):
+        rendered = template.render(**ns)
+        if os.path.isfile(fn):
+            with open(fn) as f:
+                if f.read() == rendered:
+                    return False
+        tmp = fn + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(rendered)
+                # debug: date/time caching hack
+                # f.write('\n..\n   {}'.format(datetime.datetime.now()))
+            os.replace(tmp, fn)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return True
+
+
+def make_template_env(loader):
+    return SandboxedEnvironment(loader=loader, trim_blocks=True, lstrip_blocks=True)
+
+
+# the templates of a rendering process, see `write_stubs`
+_worker_env = None
+
+
+def _init_stub_worker(template_dirs):
+    global _worker_env
+    _worker_env = make_template_env(FileSystemLoader(template_dirs))
+
+
+def _write_stub_in_worker(stub):
+    fn, template_name, ns, name = stub
+    return write_stub(fn, _worker_env.get_template(template_name), ns, name)
+
+
+def write_stubs(stubs, template_env, template_dirs, workers=1):
+    """Write the (file name, template name, namespace, name) *stubs* with
+    `write_stub`, in a pool of *workers* processes if more than one. The
+    namespaces only hold strings and lists, and each process loads the
+    templates from *template_dirs* itself. Returns the results in the order
+    of *stubs*, and the first error raised in that order.
+    """
+    workers = min(get_workers(workers), len(stubs))
+    if workers > 1:
+        chunksize = max(1, len(stubs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_stub_worker,
+                                 initargs=(template_dirs,)) as executor:
+            return list(executor.map(_write_stub_in_worker, stubs, chunksize=chunksize))
+    return [write_stub(fn, template_env.get_template(template_name), ns, name)
+            for fn, template_name, ns, name in stubs]
+
+
+def stub_digest(obj, name, template_source, build_mode, version):
+    """Hash of everything a stub is rendered from: the template, the XML of
+    the compound and, for pages, the elements its description links to
+    """
+    h = hashlib.sha1()
+    h.update(repr((STUBS_VERSION, version, name, build_mode)).encode('utf-8'))
+    h.update(template_source.encode('utf-8'))
+    h.update(ET.tostring(obj, with_tail=False))
+    if obj.get('kind') == 'page':
+        h.update(fragment_key(obj.find('detaileddescription'), build_mode, True).encode('utf-8'))
+    elif obj.get('kind') == 'namespace':
+        instrument.count('xpath')
+        h.update(repr([is_type(e) for e in obj.findall('./innerclass')]).encode('utf-8'))
+    return h.hexdigest()
+
+
+def read_stub_manifest(path):
+    """The ``{stub: {'digest', 'name', 'sources'}}`` written by the previous
+    build, if any
+    """
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != STUBS_VERSION:
+        return {}
+    return data['stubs']
+
+
+def write_stub_manifest(path, stubs):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': STUBS_VERSION, 'stubs': stubs}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def get_workers(workers):
+    """Number of workers to use for a workers option, where 0 or None means
+    one per CPU.
+    """
+    if not workers:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def compound_exists(name):
+    try:
+        import_by_name(name)
+    except ImportError:
+        return False
+    return True
+
 
 # add
 def is_type(node):
-    def_node = get_doxygen_root().find('./compounddef[@id="%s"]' % node.get('refid'))
+    def_node = find_compounddef(node.get('refid'))
     return def_node.get('kind') == 'type'
 
+@instrument.timed('generate_stubs')
+@profiling.profiled('stubs', lambda sources, *args, **kwargs:
+                    ['generate_autosummary_docs'] + [os.path.splitext(s)[0] for s in sources])
 def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
                               #base_path=None, builder=None, template_dir=None):
                               # add toctree argument
                               base_path=None, builder=None, template_dir=None, toctree=None,
-                              build_mode=None):
+                              build_mode=None, scan_workers=1, stub_workers=1,
+                              cache_dir=None):
+    """Write the stubs of the autodoxysummary directives of *sources*,
+    which are scanned by *scan_workers* processes. The stubs are rendered
+    and written by *stub_workers* processes, see `write_stubs`.
+
+    Without a *builder* (see `main`), the templates come from
+    *template_dir* and the caches go to *cache_dir*, if given, with the
+    manifest relative to *base_path*.
+    """
+    verbosity = builder.app.verbosity if builder is not None else 0
+    srcdir = builder.srcdir if builder is not None else base_path
+    if cache_dir is None and builder is not None:
+        cache_dir = builder.app.doctreedir
 
     showed_sources = list(sorted(sources))
     if len(showed_sources) > 20:
@@ -47,22 +196,49 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
         # allow the user to override the templates
         template_loader = BuiltinTemplateLoader()
         template_loader.init(builder, dirs=template_dirs)
+        # templates_path first, as the loader searches them
+        template_dirs = template_loader.pathchain
     else:
         if template_dir:
             template_dirs.insert(0, template_dir)
         template_loader = FileSystemLoader(template_dirs)
     #template_env = SandboxedEnvironment(loader=template_loader)
     # modified
-    template_env = SandboxedEnvironment(loader=template_loader,
-                                        trim_blocks=True, lstrip_blocks=True)
+    template_env = make_template_env(template_loader)
 
     # read
-    items = find_autosummary_in_files(sources)
+    scan_cache = None
+    if cache_dir is not None:
+        scan_cache = os.path.join(cache_dir, 'autodoc_doxygen.scan')
+    scanned = scan_autosummary_files(sources, cache_file=scan_cache, workers=scan_workers)
+    # the source files listing each item
+    items = {}
+    expansions = {}
+    for filename in sources:
+        for item in expand_autosummary_entries(scanned[filename], expansions):
+            items.setdefault(item, []).append(filename)
 
     # keep track of new files
     new_files = []
-
-    for name, path, template_name in sorted(set(items), key=str):
+    # (file name, template name, namespace, name) of the stubs to write
+    stubs = []
+    planned = set()
+
+    # stubs are rewritten when the digest of what they are rendered from
+    # changed, unless autosummary_generate_overwrite is off; the digests
+    # are kept next to the doctrees, relative to the source dir, along with
+    # the source files that list each stub
+    overwrite = builder is None or builder.config.autosummary_generate_overwrite
+    manifest_file = None
+    old_manifest = {}
+    manifest = {}
+    if cache_dir is not None and srcdir is not None:
+        manifest_file = os.path.join(cache_dir, 'autodoc_doxygen.stubs')
+        old_manifest = read_stub_manifest(manifest_file)
+    version = formatter_version()
+    template_sources = {}
+
+    for (name, path, template_name), item_sources in sorted(items.items(), key=lambda i: str(i[0])):
         # replace
         path = path or output_dir or os.path.abspath(toctree)
         # debug
@@ -76,7 +252,7 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
         #    continue
 
         #path = output_dir or os.path.abspath(path)
-        if builder.app.verbosity > 0:
+        if verbosity > 0:
             print("[debug] checking path: %s" % (path))
         ensuredir(path)
 
@@ -87,9 +263,21 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
             continue
 
         fn = os.path.join(path, name + suffix).replace('::', '.')
-
-        # skip it if it exists
-        if os.path.isfile(fn):
+        key = None
+        if manifest_file is not None:
+            key = os.path.relpath(fn, srcdir)
+            item_sources = [os.path.relpath(s, srcdir) for s in item_sources]
+
+        # skip it if another item writes it already
+        if fn in planned:
+            if key in manifest:
+                manifest[key]['sources'] = sorted(set(manifest[key]['sources'] + item_sources))
+            instrument.count('stubs.skipped')
+            continue
+        planned.add(fn)
+        exists = os.path.isfile(fn)
+        if exists and not overwrite:
+            instrument.count('stubs.skipped')
             continue
 
         # removed?
@@ -106,48 +294,86 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
                 # change
                 raise NotImplementedError('No template for %s (%s %s)' % (obj.items(), obj.tag, obj.get('kind')))
 
-        if builder.app.verbosity > 0:
-            print("[debug] template:%s kind: %s obj.items():%s" % (template_name, obj.get('kind'), obj.items()))
-        with open(fn, 'w') as f:
-            # debug
-            #import pdb; pdb.set_trace()
-            template = template_env.get_template(template_name)
-            # The ns keys feed into the template
-            ns = {}
-            if obj.tag == 'compounddef' and obj.get('kind') == 'class':
-                ns['methods'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-func"]/memberdef[@kind="function"]/name')]
-                ns['enums'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-type"]/memberdef[@kind="enum"]/name')]
-                ns['objtype'] = 'class'
-            elif obj.tag == 'compounddef' and obj.get('kind') == 'namespace':
-                ns['methods'] = [e.text for e in obj.findall('./sectiondef[@kind="func"]/memberdef[@kind="function"]/name')]
-                ns['types'] = [e.text for e in obj.findall('./innerclass') if is_type(e)]
-                ns['objtype'] = 'namespace'
-            elif obj.tag == 'compounddef' and obj.get('kind') == 'page':
-                if builder.app.verbosity > 0:
-                    print("[debug] xml parsing for %s" % (obj.get('id')))
-                ns['title'] = obj.find('title').text
-                ns['underline'] = len(ns['title']) * '='
-                #ns['text'] = format_xml_paragraph(obj.find('detaileddescription'),build_mode)
-                ns = format_xml_paragraph(obj.find('detaileddescription'), build_mode, nsOrig=ns, verbosity=builder.app.verbosity)
-                #if obj.get('id') == 'Specifics':
-                #    import pdb; pdb.set_trace()
-            else:
-                raise NotImplementedError(obj)
-
-            parts = name.split('::')
-            mod_name, obj_name = '::'.join(parts[:-1]), parts[-1]
-
-            ns['fullname'] = name
-            ns['module'] = mod_name
-            ns['objname'] = obj_name
-            ns['name'] = parts[-1]
-            if not('underline' in ns):
-                ns['underline'] = len(name) * '='
+        if template_name not in template_sources:
+            template_sources[template_name] = template_env.loader.get_source(
+                template_env, template_name)[0]
+        digest = stub_digest(obj, name, template_sources[template_name], build_mode, version)
+        if manifest_file is not None:
+            manifest[key] = {'digest': digest, 'name': name, 'sources': sorted(set(item_sources))}
+            if exists and old_manifest.get(key, {}).get('digest') == digest:
+                instrument.count('stubs.unchanged')
+                continue
 
-            rendered = template.render(**ns)
-            f.write(rendered)
-            # debug: date/time caching hack
-            # f.write('\n..\n   {}'.format(datetime.datetime.now()))
+        if verbosity > 0:
+            print("[debug] template:%s kind: %s obj.items():%s" % (template_name, obj.get('kind'), obj.items()))
+        # debug
+        #import pdb; pdb.set_trace()
+        # The ns keys feed into the template
+        ns = {}
+        if obj.tag == 'compounddef' and obj.get('kind') == 'class':
+            instrument.count('xpath')
+            ns['methods'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-func"]/memberdef[@kind="function"]/name')]
+            instrument.count('xpath')
+            ns['enums'] = [e.text for e in obj.findall('.//sectiondef[@kind="public-type"]/memberdef[@kind="enum"]/name')]
+            ns['objtype'] = 'class'
+        elif obj.tag == 'compounddef' and obj.get('kind') == 'namespace':
+            instrument.count('xpath')
+            ns['methods'] = [e.text for e in obj.findall('./sectiondef[@kind="func"]/memberdef[@kind="function"]/name')]
+            instrument.count('xpath')
+            ns['types'] = [e.text for e in obj.findall('./innerclass') if is_type(e)]
+            ns['objtype'] = 'namespace'
+        elif obj.tag == 'compounddef' and obj.get('kind') == 'page':
+            if verbosity > 0:
+                print("[debug] xml parsing for %s" % (obj.get('id')))
+            ns['title'] = obj.find('title').text
+            ns['underline'] = len(ns['title']) * '='
+            #ns['text'] = format_xml_paragraph(obj.find('detaileddescription'),build_mode)
+            ns = format_xml_paragraph(obj.find('detaileddescription'), build_mode, nsOrig=ns, verbosity=verbosity)
+            #if obj.get('id') == 'Specifics':
+            #    import pdb; pdb.set_trace()
+        else:
+            raise NotImplementedError(obj)
+
+        parts = name.split('::')
+        mod_name, obj_name = '::'.join(parts[:-1]), parts[-1]
+
+        ns['fullname'] = name
+        ns['module'] = mod_name
+        ns['objname'] = obj_name
+        ns['name'] = parts[-1]
+        if not('underline' in ns):
+            ns['underline'] = len(name) * '='
+
+        stubs.append((fn, template_name, ns, name))
+
+    with instrument.phase('render_templates'):
+        written = write_stubs(stubs, template_env, template_dirs, workers=stub_workers)
+    instrument.count('stubs.written', sum(written))
+    instrument.count('stubs.unchanged', len(written) - sum(written))
+
+    if manifest_file is not None:
+        if overwrite:
+            # the stubs written by an earlier build that the sources scanned
+            # now no longer list, or whose compounds are gone; stubs this
+            # code didn't write are never in the manifest
+            scanned_sources = set(os.path.relpath(s, srcdir) for s in sources)
+            for key in sorted(set(old_manifest) - set(manifest)):
+                entry = old_manifest[key]
+                others = [s for s in entry['sources'] if s not in scanned_sources
+                          and os.path.isfile(os.path.join(srcdir, s))]
+                if others and compound_exists(entry['name']):
+                    # still listed by a source this run didn't scan
+                    manifest[key] = dict(entry, sources=others)
+                    continue
+                stale = os.path.join(srcdir, key)
+                if os.path.isfile(stale):
+                    print('[autosummary] removing stale stub %s' % key)
+                    os.remove(stale)
+                    instrument.count('stubs.removed')
+        else:
+            # the stubs left alone keep their entries
+            manifest = dict(old_manifest, **manifest)
+        write_stub_manifest(manifest_file, manifest)
 
     # descend recursively to new files
     if new_files:
@@ -155,26 +381,120 @@ def generate_autosummary_docs(sources, output_dir=None, suffix='.rst',
                                   suffix=suffix, base_path=base_path, builder=builder,
                                   #template_dir=template_dir)
                                   # add toctree argument
-                                  template_dir=template_dir, toctree=toctree)
+                                  template_dir=template_dir, toctree=toctree,
+                                  scan_workers=scan_workers, stub_workers=stub_workers,
+                                  cache_dir=cache_dir)
+
 
+# Bump this whenever the layout of the scan cache changes
+SCAN_VERSION = 1
 
-def find_autosummary_in_files(filenames):
+# add generate_arg_re
+autosummary_re      = re.compile(r'^(\s*)\.\.\s+autodoxysummary::\s*')
+toctree_arg_re      = re.compile(r'^\s+:toctree:\s*(.*?)\s*$')
+template_arg_re     = re.compile(r'^\s+:template:\s*(.*?)\s*$')
+kind_arg_re         = re.compile(r'^\s+:kind:\s*(.*?)\s*$')
+generate_arg_re     = re.compile(r'^\s+:generate:\s*$')
+autosummary_item_re = re.compile(r'^\s+(~?[_a-zA-Z][a-zA-Z0-9_.:]*)\s*.*?')
+
+# the compounds listed by ``:generate:`` and ``:kind:``
+# todo: break when this doesn't exist
+# look for modules and standalone documentation pages, but *not* the index page
+# itself (which it links to from itself for some reason...)
+KIND_XPATHS = {
+    'mod': './compound[@kind="namespace"]',
+    'page': './compound[@kind="page" and not(@refid="indexpage")]',
+}
+
+
+def find_autosummary_in_files(filenames, cache_file=None, workers=1):
     """Find out what items are documented in source/*.rst.
 
-    See `find_autosummary_in_lines`.
+    The ``:kind:`` lists are always taken from the current XML. See
+    `scan_autosummary_files` and `find_autosummary_in_lines`.
     """
-    # todo: break when this doesn't exist
-    # look for modules and standalone documentation pages, but *not* the index page
-    # itself (which it links to from itself for some reason...)
+    scanned = scan_autosummary_files(filenames, cache_file=cache_file, workers=workers)
     documented = []
+    expansions = {}
     for filename in filenames:
-        with codecs.open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.read().splitlines()
-            documented.extend(find_autosummary_in_lines(lines, filename=filename))
-
+        documented.extend(expand_autosummary_entries(scanned[filename], expansions))
     return documented
 
 
+def scan_autosummary_files(filenames, cache_file=None, workers=1):
+    """The ``{filename: entries}`` of `scan_autosummary_file`.
+
+    The directives found in each file are kept in *cache_file*, if given,
+    and only scanned again when the file's mtime or size changed. With more
+    than one worker, the files not in the cache are scanned in a process
+    pool.
+    """
+    cache = read_scan_cache(cache_file) if cache_file else {}
+    scanned = {}
+    missing = []
+    for filename in filenames:
+        st = os.stat(filename)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = cache.get(filename)
+        if entry is not None and entry[0] == stamp:
+            scanned[filename] = entry
+            instrument.count('scan_cache.hit')
+        else:
+            scanned[filename] = (stamp, None)
+            missing.append(filename)
+            instrument.count('scan_cache.miss')
+
+    workers = min(get_workers(workers), len(missing))
+    if workers > 1:
+        chunksize = max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(scan_autosummary_file, missing, chunksize=chunksize))
+    else:
+        results = [scan_autosummary_file(filename) for filename in missing]
+    for filename, entries in zip(missing, results):
+        scanned[filename] = (scanned[filename][0], entries)
+
+    if cache_file and (missing or len(cache) != len(scanned)):
+        write_scan_cache(cache_file, scanned)
+    return dict((filename, entries) for filename, (_, entries) in scanned.items())
+
+
+def read_scan_cache(path):
+    """The ``{filename: ((mtime, size), entries)}`` of the previous scan"""
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        # a missing, truncated or foreign file is just an empty cache
+        return {}
+    if not isinstance(data, dict) or data.get('version') != SCAN_VERSION:
+        return {}
+    return data['files']
+
+
+def write_scan_cache(path, files):
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump({'version': SCAN_VERSION, 'files': files}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def scan_autosummary_file(filename):
+    """The autodoxysummary entries of *filename*, see
+    `scan_autosummary_lines`
+    """
+    with codecs.open(filename, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    # most generated documents don't have any
+    if 'autodoxysummary' not in text:
+        return []
+    return scan_autosummary_lines(text.splitlines(), filename=filename)
+
+
 def find_autosummary_in_lines(lines, module=None, filename=None):
     """Find out what items appear in autosummary:: directives in the
     given lines.
@@ -186,15 +506,35 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
     *template* ``None`` if the directive does not have the
     corresponding options set.
     """
+    return expand_autosummary_entries(scan_autosummary_lines(lines, filename=filename))
 
-    # add generate_arg_re
-    autosummary_re      = re.compile(r'^(\s*)\.\.\s+autodoxysummary::\s*')
-    toctree_arg_re      = re.compile(r'^\s+:toctree:\s*(.*?)\s*$')
-    template_arg_re     = re.compile(r'^\s+:template:\s*(.*?)\s*$')
-    kind_arg_re         = re.compile(r'^\s+:kind:\s*(.*?)\s*$')
-    generate_arg_re     = re.compile(r'^\s+:generate:\s*$')
-    autosummary_item_re = re.compile(r'^\s+(~?[_a-zA-Z][a-zA-Z0-9_.:]*)\s*.*?')
 
+def expand_autosummary_entries(entries, expansions=None):
+    """The (name, toctree, template) items of the *entries* of
+    `scan_autosummary_lines`, with the ``:kind:`` lists looked up in the
+    XML (and kept in *expansions*)
+    """
+    if expansions is None:
+        expansions = {}
+    documented = []
+    for name, toctree, template, kind in entries:
+        if kind is None:
+            documented.append((name, toctree, template))
+            continue
+        if kind not in expansions:
+            instrument.count('xpath')
+            results = get_doxygen_root().xpath(KIND_XPATHS[kind])
+            expansions[kind] = [result.find('name').text for result in results]
+        documented.extend((name, toctree, template) for name in expansions[kind])
+    return documented
+
+
+def scan_autosummary_lines(lines, filename=None):
+    """The autodoxysummary directives in the given lines, without looking
+    at the XML: a list of (name, toctree, template, None) for the listed
+    items and (None, toctree, template, kind) for the ``:generate:`` and
+    ``:kind:`` lists (see `expand_autosummary_entries`).
+    """
     documented = []
 
     toctree = None
@@ -228,16 +568,8 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
             m = kind_arg_re.match(line)
             if m and generate:
                 kind = m.group(1).strip()
-                xpath = None
-                if kind == 'mod':
-                    xpath = './compound[@kind="namespace"]'
-                elif kind == 'page':
-                    xpath = './compound[@kind="page" and not(@refid="indexpage")]'
-
-                if xpath is not None:
-                    results = get_doxygen_root().xpath(xpath)
-                    for result in results:
-                        documented.append((result.find('name').text, toctree, template))
+                if kind in KIND_XPATHS:
+                    documented.append((None, toctree, template, kind))
 
                 continue
 
@@ -251,7 +583,7 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
                 name = m.group(1).strip()
                 if name.startswith('~'):
                     name = name[1:]
-                documented.append((name, toctree, template))
+                documented.append((name, toctree, template, None))
                 continue
 
             if not line.strip() or line.startswith(base_indent + " "):
@@ -272,6 +604,7 @@ def find_autosummary_in_lines(lines, module=None, filename=None):
     return documented
 
 
+@tracing.traced('process_generate_options')
 def process_generate_options(app):
     genfiles = app.config.autosummary_generate
     # add
@@ -296,4 +629,73 @@ def process_generate_options(app):
     generate_autosummary_docs(genfiles, builder=app.builder,
     # add toctree argument
     #                         suffix=ext, base_path=app.srcdir)
-                              suffix=ext, base_path=app.srcdir, toctree=toctree, build_mode=sphinx_build_mode)
+                              suffix=ext, base_path=app.srcdir, toctree=toctree, build_mode=sphinx_build_mode,
+                              scan_workers=app.config.doxygen_scan_workers,
+                              stub_workers=app.config.doxygen_stub_workers)
+
+
+def main(argv=None):
+    """autodoc-doxygen-stubs: write the autodoxysummary stubs of a project
+    without running sphinx-build
+    """
+    parser = argparse.ArgumentParser(
+        prog='autodoc-doxygen-stubs',
+        description='Generate the stubs of the autodoxysummary directives of a '
+                    'Sphinx project from the doxygen XML, outside sphinx-build')
+    parser.add_argument('source_dir', help='source directory of the Sphinx project')
+    parser.add_argument('xml_dir', help='directory of the doxygen XML output')
+    parser.add_argument('sources', nargs='+',
+                        help='files to scan, relative to source_dir, like autosummary_generate')
+    parser.add_argument('-t', '--templates', dest='template_dir',
+                        help='directory of templates overriding the bundled ones')
+    parser.add_argument('-o', '--output-dir',
+                        help='where to write the stubs of directives without :toctree:')
+    parser.add_argument('-s', '--suffix', default='.rst', help='source suffix (default .rst)')
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help='number of processes rendering and writing the stubs, 0 for '
+                             'one per CPU (default 1)')
+    parser.add_argument('--scan-workers', type=int, default=1,
+                        help='number of processes scanning the sources, 0 for one per CPU '
+                             '(default 1)')
+    parser.add_argument('-d', '--cache-dir',
+                        help='keep the caches there, e.g. the doctree directory of '
+                             'sphinx-build, so later builds reuse them; needed by the '
+                             'sqlite mode for its database')
+    parser.add_argument('-m', '--mode', default='eager', choices=('eager', 'lazy', 'sqlite'),
+                        help='doxygen_xml_mode (default eager)')
+    parser.add_argument('--index', default='', help='prebuilt doxygen_xml_index file')
+    parser.add_argument('-b', '--build-mode', default='html',
+                        help='sphinx_build_mode the stubs are written for (default html)')
+    args = parser.parse_args(argv)
+    if args.mode == 'sqlite' and args.cache_dir is None:
+        parser.error('the sqlite mode keeps its database in the cache directory, '
+                     'give one with -d')
+
+    # the part of a Sphinx application set_doxygen_xml looks at
+    cached = args.cache_dir is not None
+    app = SimpleNamespace(confdir=os.getcwd(), doctreedir=args.cache_dir, config=SimpleNamespace(
+        doxygen_xml=args.xml_dir, doxygen_xml_mode=args.mode, doxygen_xml_index=args.index,
+        doxygen_xml_cache=cached,
+        doxygen_xml_lazy_cache_size=256, doxygen_sqlite_db='',
+        doxygen_format_cache_size=4096, doxygen_fragment_cache=False))
+
+    start = time.perf_counter()
+    try:
+        set_doxygen_xml(app)
+    except ExtensionError as e:
+        print(e, file=sys.stderr)
+        return 1
+    loaded = time.perf_counter()
+
+    generate_autosummary_docs(args.sources, output_dir=args.output_dir, suffix=args.suffix,
+                              base_path=args.source_dir, template_dir=args.template_dir,
+                              toctree=args.output_dir or args.source_dir,
+                              build_mode=args.build_mode, scan_workers=args.scan_workers,
+                              stub_workers=args.workers, cache_dir=args.cache_dir)
+    print('[autosummary] xml loaded in %.2fs, stubs generated in %.2fs'
+          % (loaded - start, time.perf_counter() - loaded))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+from __future__ import print_function, absolute_import, division
+
+# Summary rows of the autosummary tables, read straight from the resolved
+# elements.
+#
+# The generic path builds a whole documenter per row and runs add_content and
+# process_doc to get the brief description as reST lines. Without
+# autodoc-process-docstring listeners those only join the formatted brief
+# description with blank lines, so `summarize` does that directly and gives
+# the same (signature, summary) as the documenter would. The formatted
+# descriptions come from the format memo and the fragment cache, so there is
+# nothing left worth keeping per row.
+
+import re
+
+from .. import find_compounddefs_by_name
+from ..xmlutils import format_xml_paragraph
+
+
+def has_docstring_listeners(app):
+    """Whether something may rewrite the docstrings, in which case the rows
+    must go through the documenters
+    """
+    return bool(app.events.listeners.get('autodoc-process-docstring'))
+
+
+def join_docstrings(docstrings):
+    """The lines process_doc yields for *docstrings*, without the event"""
+    lines = []
+    for docstringlines in docstrings:
+        lines.extend(docstringlines)
+        if docstringlines and docstringlines[-1] != '':
+            lines.append('')
+    return lines
+
+
+def first_sentence(doc):
+    """The summary of the *doc* lines: its first sentence, or its first line
+    if there isn't any, up to the first blank line
+    """
+    doc = list(doc)
+    while doc and not doc[0].strip():
+        doc.pop(0)
+
+    # If there's a blank line, then we can assume the first sentence /
+    # paragraph has ended, so anything after shouldn't be part of the
+    # summary
+    for i, piece in enumerate(doc):
+        if not piece.strip():
+            doc = doc[:i]
+            break
+
+    # Try to find the "first sentence", which may span multiple lines
+    m = re.search(r"^([A-Z].*?\.)(?:\s|$)", " ".join(doc).strip())
+    if m:
+        return m.group(1).strip()
+    elif doc:
+        return doc[0].strip()
+    return ''
+
+
+def summarize(obj, real_name, build_mode):
+    """``(signature, summary)`` of the row of *obj*, or None if it needs
+    the documenter (anything it could warn about or fail on)
+    """
+    if obj.tag == 'memberdef' and obj.get('kind') == 'function':
+        # DoxygenMethodDocumenter with brief=True
+        argsstring = obj.find('argsstring')
+        brief = obj.find('briefdescription')
+        if obj.get('id') is None or argsstring is None or brief is None:
+            return None
+        sig = argsstring.text
+        docstrings = [format_xml_paragraph(brief, build_mode)]
+    elif obj.tag == 'compounddef':
+        # DoxygenModuleDocumenter with brief=True
+        name = real_name.replace('.', '::')
+        brief = obj.find('briefdescription')
+        if brief is None or find_compounddefs_by_name(name) != [obj]:
+            return None
+        sig = None
+        docstrings = [format_xml_paragraph(brief, build_mode)]
+        if not any(len(d.strip()) for d in docstrings[0]):
+            docstrings.append(['<undocumented>', ''])
+        docstrings.append(['`More... <DETA%s_>`_' % name, ''])
+    else:
+        return None
+
+    return sig, first_sentence(join_docstrings(docstrings))
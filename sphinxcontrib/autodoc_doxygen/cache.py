@@ -0,0 +1,96 @@
+from __future__ import print_function, absolute_import, division
+
+# Persistent on-disk cache of the merged doxygen XML tree.
+#
+# The cache is a single pickle holding a manifest of the XML files it was
+# built from (path -> size, mtime and sha1 of the content) and the merged
+# tree serialized back to XML. Reparsing one serialized document is much
+# cheaper than parsing and merging thousands of compound files, and the
+# manifest tells us when the doxygen output has changed underneath us.
+
+import hashlib
+import os
+import pickle
+
+from lxml import etree as ET
+
+# Bump this whenever the layout of the cached data changes
+CACHE_VERSION = 1
+
+
+def file_digest(data):
+    """Content hash used to key the cached files"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_entry(path, data):
+    """Manifest entry ``(size, mtime, sha1)`` for *path* with content *data*"""
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns, file_digest(data))
+
+
+def read_cache(cache_file):
+    """Load the cached data from *cache_file*, or None if there is no
+    usable cache.
+    """
+    if cache_file is None or not os.path.isfile(cache_file):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        # a truncated or foreign file is just a cache miss
+        return None
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None
+    return data
+
+
+def check_manifest(manifest, files):
+    """Compare a cached *manifest* with the current *files*.
+
+    Returns the manifest refreshed with the current sizes and mtimes if
+    the content of every file is unchanged, otherwise None. Files whose
+    size and mtime still match are trusted without being read; the others
+    are only considered changed if their content hash differs.
+    """
+    if set(manifest) != set(files):
+        # files were added or removed
+        return None
+
+    current = {}
+    for path in files:
+        st = os.stat(path)
+        size, mtime, digest = manifest[path]
+        if (st.st_size, st.st_mtime_ns) != (size, mtime):
+            if st.st_size != size:
+                return None
+            with open(path, 'rb') as f:
+                if file_digest(f.read()) != digest:
+                    return None
+        current[path] = (st.st_size, st.st_mtime_ns, digest)
+    return current
+
+
+def write_cache(cache_file, manifest, root):
+    """Store the merged *root* and the *manifest* of its files"""
+    data = {
+        'version': CACHE_VERSION,
+        'manifest': manifest,
+        'xml': ET.tostring(root, encoding='UTF-8'),
+    }
+    dirname = os.path.dirname(cache_file)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    # write next to the cache and rename so an interrupted build never
+    # leaves a half written cache behind
+    tmp = cache_file + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_file)
+
+
+def restore_root(data):
+    """Rebuild the merged root element from the cached data"""
+    parser = ET.XMLParser(huge_tree=True)
+    return ET.fromstring(data['xml'], parser)
@@ -0,0 +1,168 @@
+from __future__ import print_function, absolute_import, division
+
+# Which doxygen compounds each document was built from.
+#
+# The documenters and the autosummary tables note the elements they read
+# with `note_element`: the compound that defines the element, and the
+# compounds of the elements its descriptions link to, since visit_ref
+# renders their names. The compound ids of each docname are kept in the
+# environment together with the size, mtime and hash of the compound files,
+# so `get_outdated` only sends a document back to be read when the XML of
+# one of its compounds changed. A build from a prebuilt index without the
+# XML directory can only tell whether the index file changed, and then
+# reads all of them again.
+
+import os
+
+from . import find_compound_id, instrument
+from .cache import file_entry
+
+# doxygen's index.xml, which tells what names exist at all
+INDEX = 'index'
+# the state of the prebuilt index file, when there is no XML directory
+PREBUILT = ':prebuilt'
+
+
+def compound_id(node):
+    """The id of the <compounddef> *node* belongs to, or None"""
+    if node.tag != 'compounddef':
+        node = next(node.iterancestors('compounddef'), None)
+    return node.get('id') if node is not None else None
+
+
+def _deps(env):
+    if not hasattr(env, 'doxygen_deps'):
+        env.doxygen_deps = {}         # docname -> set of compound ids
+    return env.doxygen_deps.setdefault(env.docname, set())
+
+
+def note_compound(env, refid):
+    """Record that the document being read depends on the compound *refid*"""
+    if refid is not None:
+        _deps(env).add(refid)
+
+
+def note_index(env):
+    """Record that the document being read depends on which compounds
+    exist, e.g. because it lists them or a name didn't resolve
+    """
+    note_compound(env, INDEX)
+
+
+def note_element(env, node):
+    """Record that the document being read uses the element *node*"""
+    if node is None:
+        return
+    # the module documenter and its members go over the same elements
+    noted = env.temp_data.setdefault('doxygen_noted', set())
+    if node in noted:
+        return
+    noted.add(node)
+
+    deps = _deps(env)
+    deps.add(compound_id(node))
+    for ref in node.iter('ref'):
+        deps.add(find_compound_id(ref.get('refid')))
+    deps.discard(None)
+
+
+def compound_file(xml_dir, refid):
+    """The doxygen XML file of the compound *refid*"""
+    return os.path.join(xml_dir, refid + '.xml')
+
+
+def file_state(path, previous=None):
+    """The ``(size, mtime, sha1)`` of *path*, None if it doesn't exist.
+    The file isn't read again if its size and mtime match *previous*.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if previous is not None and previous[:2] == (st.st_size, st.st_mtime_ns):
+        return previous
+    with open(path, 'rb') as f:
+        return file_entry(path, f.read())
+
+
+def prebuilt_index(app):
+    """The prebuilt index file the XML is loaded from when the XML directory
+    isn't there, None otherwise
+    """
+    if app.config.doxygen_xml_index and not os.path.isdir(app.config.doxygen_xml):
+        return os.path.join(app.confdir, app.config.doxygen_xml_index)
+    return None
+
+
+def changed_compounds(xml_dir, digests, refids):
+    """The *refids* whose file differs from the state in *digests*"""
+    changed = set()
+    for refid in refids:
+        previous = digests.get(refid)
+        current = file_state(compound_file(xml_dir, refid), previous)
+        if (current and current[2]) != (previous and previous[2]):
+            changed.add(refid)
+    return changed
+
+
+def get_outdated(app, env, added, changed, removed):
+    """The documents built from doxygen compounds that changed since"""
+    deps = getattr(env, 'doxygen_deps', {})
+    if not deps:
+        return []
+    digests = getattr(env, 'doxygen_digests', {})
+    refids = set().union(*deps.values())
+    index_file = prebuilt_index(app)
+    if index_file is not None:
+        # any compound may have changed with the index
+        previous = digests.get(PREBUILT)
+        current = file_state(index_file, previous)
+        changed = (current and current[2]) != (previous and previous[2])
+        compounds = refids if changed else set()
+    else:
+        compounds = changed_compounds(app.config.doxygen_xml, digests, refids)
+    if not compounds:
+        return []
+
+    outdated = [docname for docname, refids in deps.items()
+                if refids & compounds and docname not in removed]
+    instrument.count('depends.outdated', len(outdated))
+    print('[autodoc_doxygen] %d doxygen compounds changed, %d documents outdated'
+          % (len(compounds), len(outdated)))
+    return outdated
+
+
+def update_digests(app, env):
+    """Remember the state of the compound files the documents use"""
+    deps = getattr(env, 'doxygen_deps', {})
+    previous = getattr(env, 'doxygen_digests', {})
+    digests = {}
+    index_file = prebuilt_index(app)
+    if index_file is not None:
+        state = file_state(index_file, previous.get(PREBUILT))
+        if state is not None:
+            digests[PREBUILT] = state
+        env.doxygen_digests = digests
+        return []
+    for refid in set().union(*deps.values()):
+        state = file_state(compound_file(app.config.doxygen_xml, refid), previous.get(refid))
+        if state is not None:
+            digests[refid] = state
+    env.doxygen_digests = digests
+    return []
+
+
+def purge_doc(app, env, docname):
+    if hasattr(env, 'doxygen_deps'):
+        env.doxygen_deps.pop(docname, None)
+
+
+def merge_info(app, env, docnames, other):
+    """Take the dependencies of the documents read by a parallel worker"""
+    if not hasattr(other, 'doxygen_deps'):
+        return
+    if not hasattr(env, 'doxygen_deps'):
+        env.doxygen_deps = {}
+    for docname in docnames:
+        if docname in other.doxygen_deps:
+            env.doxygen_deps[docname] = other.doxygen_deps[docname]
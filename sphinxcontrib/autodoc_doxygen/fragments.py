@@ -0,0 +1,102 @@
+from __future__ import print_function, absolute_import, division
+
+# Persistent on-disk cache of formatted descriptions.
+#
+# Converting a description to reST is the bulk of the work done for each
+# documented object. The lines produced are stored in a pickle next to the
+# doctrees, keyed by a hash of everything the formatter looks at (see
+# `xmlutils.fragment_key`), so a later build only formats the descriptions
+# whose XML actually changed.
+
+import os
+import pickle
+
+# Bump this whenever the layout of the cached data changes
+FRAGMENTS_VERSION = 2
+
+# entries not used by this many of the builds that used the cache are
+# dropped when it is saved
+MAX_AGE = 20
+
+
+class FragmentCache(object):
+
+    def __init__(self, cache_file, version):
+        self.cache_file = cache_file
+        # identifies the formatter, entries of another version are ignored
+        self.version = version
+        self.generation = 0
+        self.entries = {}  # key -> [generation last used, lines, footnotes]
+        self.hits = 0
+        self.misses = 0
+        # entries used since `track`, only kept in parallel readers
+        self.used = None
+
+    def load(self):
+        """Read the entries saved by a previous build, if any"""
+        if not os.path.isfile(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = pickle.load(f)
+        except Exception:
+            # a truncated or foreign file is just an empty cache
+            return
+        if (not isinstance(data, dict) or data.get('version') != FRAGMENTS_VERSION
+                or data.get('formatter') != self.version):
+            return
+        self.generation = data['generation'] + 1
+        self.entries = data['entries']
+
+    def get(self, key):
+        """The ``(lines, footnotes)`` stored for *key*, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[0] = self.generation
+        if self.used is not None:
+            self.used[key] = entry
+        return entry[1], entry[2]
+
+    def put(self, key, lines, footnotes):
+        self.entries[key] = [self.generation, lines, footnotes]
+        if self.used is not None:
+            self.used[key] = self.entries[key]
+
+    def track(self):
+        """Start recording the entries used, for `merge` in the process
+        this one was forked from
+        """
+        self.used = {}
+        self.hits = self.misses = 0
+
+    def merge(self, used):
+        """Take the ``(used, hits, misses)`` of a forked process"""
+        entries, hits, misses = used
+        for key, entry in entries.items():
+            self.entries[key] = [self.generation, entry[1], entry[2]]
+        self.hits += hits
+        self.misses += misses
+
+    def save(self):
+        """Write the entries back, unless this build didn't use the cache"""
+        if not self.hits and not self.misses:
+            return
+        oldest = self.generation - MAX_AGE
+        entries = dict((key, entry) for key, entry in self.entries.items()
+                       if entry[0] > oldest)
+        data = {
+            'version': FRAGMENTS_VERSION,
+            'formatter': self.version,
+            'generation': self.generation,
+            'entries': entries,
+        }
+        dirname = os.path.dirname(self.cache_file)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = self.cache_file + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_file)
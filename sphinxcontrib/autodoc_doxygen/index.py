@@ -0,0 +1,129 @@
+from __future__ import print_function, absolute_import, division
+
+# Lookup tables over the doxygen XML, built once when the XML is loaded so
+# that resolving a reference or a name doesn't need to scan the whole tree.
+
+
+# elements formatted by format_xml_paragraph
+DESCRIPTIONS = ('briefdescription', 'detaileddescription', 'inbodydescription')
+
+# features of a description that change how the formatter handles it
+LATEXONLY = 1
+HTMLONLY = 2
+LATEX_IMAGE = 4
+
+
+def _feature_flag(element):
+    if element.tag == 'latexonly':
+        return LATEXONLY
+    if element.tag == 'htmlonly':
+        return HTMLONLY
+    if element.tag == 'image' and element.get('type') == 'latex':
+        return LATEX_IMAGE
+    return 0
+
+
+def description_flags(node):
+    """The feature flags of the subtree of *node*"""
+    flags = 0
+    for element in node.iter('latexonly', 'htmlonly', 'image'):
+        flags |= _feature_flag(element)
+    return flags
+
+
+def _in_file_compound(element):
+    # doxygen repeats the members of a namespace in the <compounddef
+    # kind="file"> declaring them, with the same id
+    return element.xpath('ancestor-or-self::compounddef[1]/@kind') == ['file']
+
+
+class DoxygenIndex(object):
+
+    def __init__(self, root=None):
+        self.root = root
+        self.ids = {}  # id -> [element]
+        self.names = {}  # compoundname -> [compounddef]
+        # (compoundname, sectiondef kind, memberdef kind, name) -> [memberdef]
+        # in document order, so overloads keep their position
+        self.members = {}
+        # description element -> feature flags of its subtree
+        self.flags = {}
+        if root is not None:
+            self.add(root)
+
+    def add(self, node):
+        """Index *node* and all the elements below it that have an id, and
+        the compounds and their members by name, and the feature flags of
+        its descriptions
+        """
+        ids = self.ids
+        duplicates = set()
+        for element in node.xpath('descendant-or-self::*[@id]'):
+            refid = element.get('id')
+            if refid in ids:
+                ids[refid].append(element)
+                duplicates.add(refid)
+            else:
+                ids[refid] = [element]
+
+        # prefer the real definition over the copy in the file compound,
+        # otherwise keep the document order
+        for refid in duplicates:
+            ids[refid].sort(key=_in_file_compound)
+
+        # the special elements are rare, so mark their enclosing descriptions
+        # rather than scanning every description
+        flags = self.flags
+        for element in node.iter(*DESCRIPTIONS):
+            flags[element] = 0
+        for element in node.iter('latexonly', 'htmlonly', 'image'):
+            flag = _feature_flag(element)
+            if flag:
+                for description in element.iterancestors(*DESCRIPTIONS):
+                    flags[description] |= flag
+
+        if node.tag == 'compounddef':
+            compounds = [node]
+        else:
+            compounds = node.iterfind('compounddef')
+        for compound in compounds:
+            compound_name = compound.findtext('compoundname')
+            self.names.setdefault(compound_name, []).append(compound)
+            for section in compound.iterfind('sectiondef'):
+                section_kind = section.get('kind')
+                for member in section.iterfind('memberdef'):
+                    key = (compound_name, section_kind, member.get('kind'),
+                           member.findtext('name'))
+                    self.members.setdefault(key, []).append(member)
+
+    def find_id(self, refid):
+        """All the elements with id *refid*. The list is shared, don't
+        modify it.
+        """
+        return self.ids.get(refid, [])
+
+    def find_compounddef(self, refid):
+        """The <compounddef> with id *refid*, or None"""
+        for element in self.ids.get(refid, ()):
+            if element.tag == 'compounddef':
+                return element
+        return None
+
+    def find_by_name(self, name):
+        """All the <compounddef> named *name*, in document order. The list
+        is shared, don't modify it.
+        """
+        return self.names.get(name, [])
+
+    def find_members(self, compound_name, name, kind='function', section='func'):
+        """All the <memberdef kind="*kind*"> named *name* in the <sectiondef
+        kind="*section*"> of the compounds named *compound_name*, in
+        document order. The list is shared, don't modify it.
+        """
+        return self.members.get((compound_name, section, kind, name), [])
+
+    def find_flags(self, node):
+        """The feature flags of the description *node*, or None if it isn't
+        part of the index
+        """
+        return self.flags.get(node)
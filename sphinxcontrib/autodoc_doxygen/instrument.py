@@ -0,0 +1,135 @@
+from __future__ import print_function, absolute_import, division
+
+# Build instrumentation.
+#
+# Records the wall time spent in each phase of the build (loading the XML,
+# resolving names, formatting descriptions, rendering stubs, each kind of
+# documenter...) and counts the interesting events (index lookups, cache
+# hits, XPath queries, lines emitted). Everything is a no-op unless
+# `enable` was called, so the calls can stay in the hot paths.
+#
+# Phases nest, e.g. "format" time is also part of the "documenter.*" phase
+# that asked for it, so the times in the report are inclusive.
+
+import functools
+import json
+import time
+
+ENABLED = False
+
+timings = {}   # phase -> [calls, total seconds]
+counters = {}  # name -> count
+
+
+class _Phase(object):
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        entry = timings.get(self.name)
+        if entry is None:
+            timings[self.name] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        return False
+
+
+class _NoPhase(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_PHASE = _NoPhase()
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    timings.clear()
+    counters.clear()
+
+
+def phase(name):
+    """Context manager timing the *name* phase"""
+    if not ENABLED:
+        return _NO_PHASE
+    return _Phase(name)
+
+
+def timed(name):
+    """Decorator timing every call of the function as the *name* phase"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Add *n* to the *name* counter"""
+    if ENABLED:
+        counters[name] = counters.get(name, 0) + n
+
+
+def snapshot(extra=None):
+    """The recorded timings and counters as a JSON friendly dict, *extra*
+    counters (e.g. cache statistics kept elsewhere) are merged in
+    """
+    all_counters = dict(counters)
+    if extra:
+        all_counters.update(extra)
+    return {
+        'phases': dict((name, {'calls': calls, 'total': total})
+                       for name, (calls, total) in timings.items()),
+        'counters': all_counters,
+    }
+
+
+def merge(data):
+    """Add a `snapshot` taken in another process"""
+    for name, entry in data['phases'].items():
+        calls, total = timings.get(name, (0, 0.0))
+        timings[name] = [calls + entry['calls'], total + entry['total']]
+    for name, value in data['counters'].items():
+        counters[name] = counters.get(name, 0) + value
+
+
+def format_report(data):
+    """Lines of the summary table of a `snapshot`"""
+    lines = ['%-34s %8s %10s %10s' % ('phase (inclusive)', 'calls', 'total s', 'mean ms')]
+    phases = sorted(data['phases'].items(), key=lambda item: -item[1]['total'])
+    for name, entry in phases:
+        lines.append('%-34s %8d %10.3f %10.3f' % (
+            name, entry['calls'], entry['total'], 1e3 * entry['total'] / entry['calls']))
+    if data['counters']:
+        lines.append('')
+        lines.append('%-34s %8s' % ('counter', 'count'))
+        for name, value in sorted(data['counters'].items()):
+            lines.append('%-34s %8d' % (name, value))
+    return lines
+
+
+def write_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
@@ -0,0 +1,114 @@
+from __future__ import print_function, absolute_import, division
+
+# On-demand loading of doxygen compounds.
+#
+# Doxygen writes one file per compound, named after its refid, and lists
+# every compound and its members in index.xml. In lazy mode only index.xml
+# is parsed up front; a compound file is parsed the first time something
+# asks for it and kept in a bounded LRU.
+
+import os
+from collections import OrderedDict
+
+from lxml import etree as ET
+
+from .index import DoxygenIndex
+
+
+class LazyCompounds(object):
+
+    def __init__(self, xml_dir, index_root, maxsize=256):
+        self.xml_dir = xml_dir
+        # maximum number of parsed compounds to keep, 0 for no limit
+        self.maxsize = maxsize
+        self.kinds = {}            # compound refid -> kind
+        self.names = {}            # compoundname -> [compound refid]
+        self.member_compound = {}  # member refid -> compound refid
+        # compound refid -> DoxygenIndex of the parsed compound
+        self.loaded = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        for compound in index_root.iterfind('compound'):
+            refid = compound.get('refid')
+            self.kinds[refid] = compound.get('kind')
+            self.names.setdefault(compound.findtext('name'), []).append(refid)
+            for member in compound.iterfind('member'):
+                member_refid = member.get('refid')
+                # namespace members are listed again under the file that
+                # declares them, prefer the namespace
+                previous = self.member_compound.get(member_refid)
+                if previous is None or self.kinds[previous] == 'file':
+                    self.member_compound[member_refid] = refid
+
+    def get(self, refid):
+        """The <compounddef> with id *refid*, or None"""
+        index = self.loaded.get(refid)
+        if index is not None:
+            self.hits += 1
+            self.loaded.move_to_end(refid)
+            return index.root
+
+        node = self._parse(refid)
+        if node is None:
+            return None
+
+        self.loaded[refid] = DoxygenIndex(node)
+        if self.maxsize and len(self.loaded) > self.maxsize:
+            # elements still referenced elsewhere stay valid, we only drop
+            # our reference to the least recently used compound
+            self.loaded.popitem(last=False)
+        return node
+
+    def _parse(self, refid):
+        # the <compounddef> of *refid* read from its file, or None
+        path = os.path.join(self.xml_dir, refid + '.xml')
+        if refid not in self.kinds or not os.path.isfile(path):
+            return None
+
+        self.misses += 1
+        return ET.parse(path).getroot().find('compounddef')
+
+    def _refids(self, name):
+        # the refids of the compounds named *name*, in index order
+        return self.names.get(name, ())
+
+    def get_by_name(self, name):
+        """All the <compounddef> named *name*, in index order"""
+        nodes = [self.get(refid) for refid in self._refids(name)]
+        return [node for node in nodes if node is not None]
+
+    def find_members(self, compound_name, name, kind='function', section='func'):
+        """All the matching <memberdef> of the compounds named *compound_name*,
+        see `DoxygenIndex.find_members`
+        """
+        members = []
+        for refid in self._refids(compound_name):
+            if self.get(refid) is not None:
+                members.extend(self.loaded[refid].find_members(
+                    compound_name, name, kind=kind, section=section))
+        return members
+
+    def compound_of(self, refid):
+        """The refid of the compound that defines the element *refid*"""
+        if refid in self.kinds:
+            return refid
+        if refid in self.member_compound:
+            return self.member_compound[refid]
+        # anchors and sections aren't listed in index.xml, but their ids
+        # are "<compound refid>_1<name>"
+        head = refid
+        while '_1' in head:
+            head = head.rsplit('_1', 1)[0]
+            if head in self.kinds:
+                return head
+        return None
+
+    def find_id(self, refid):
+        """All the elements with id *refid*, loading their compound if needed"""
+        compound_refid = self.compound_of(refid)
+        if compound_refid is None:
+            return []
+        if self.get(compound_refid) is None:
+            return []
+        return self.loaded[compound_refid].find_id(refid)
@@ -0,0 +1,49 @@
+from __future__ import print_function, absolute_import, division
+
+# Parsing of the doxygen XML files into one merged tree.
+#
+# The files used to be parsed in a pool of worker processes, but lxml
+# elements can't cross processes: the workers sent the compounds back
+# serialized and this process parsed them all again, which always took
+# longer than parsing the files here (1.1s with two workers against 0.4s
+# for 2600 files).
+
+import os
+
+from lxml import etree as ET
+
+from . import cache, tracing
+
+
+def _read_file(path, with_digest):
+    with open(path, 'rb') as f:
+        content = f.read()
+    entry = cache.file_entry(path, content) if with_digest else None
+    return content, entry
+
+
+def list_xml_files(xml_dir):
+    """The doxygen XML files of *xml_dir*, sorted"""
+    return [os.path.join(xml_dir, f) for f in sorted(os.listdir(xml_dir))
+            if f.lower().endswith('.xml') and not f.startswith('._')]
+
+
+def parse_xml_files(files, with_digest=False):
+    """Parse *files* and merge the children of each document under a single
+    root element, in the order of *files*.
+
+    Returns ``(root, manifest)``, where *manifest* maps each file to its
+    cache entry if *with_digest* is set, and is empty otherwise.
+    """
+    manifest = {}
+    root = ET.ElementTree(ET.Element('root')).getroot()
+    for file in files:
+        with tracing.span('parse_file', file=os.path.basename(file)):
+            if with_digest:
+                content, manifest[file] = _read_file(file, with_digest)
+                doc = ET.fromstring(content, base_url=file)
+            else:
+                doc = ET.parse(file).getroot()
+            for node in doc:
+                root.append(node)
+    return root, manifest
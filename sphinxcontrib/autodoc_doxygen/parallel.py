@@ -0,0 +1,126 @@
+from __future__ import print_function, absolute_import, division
+
+# Parallel reading (sphinx-build -j).
+#
+# Sphinx forks a process for each chunk of documents after
+# env-before-read-docs, and each one starts with everything the main process
+# loaded. The merged tree and its DoxygenIndex are millions of Python
+# objects, and every time a worker touches one of them (reference counts,
+# the cycle collector walking them) the page holding it is copied, so
+# memory grew with -j.
+#
+# Before the fork the objects are moved out of the collector's reach with
+# gc.freeze(), and the workers read the compounds they need from the XML
+# files through a LazyCompounds built from the <compound> entries of the
+# tree. That is a few dicts of strings, shared and never written. A tree
+# restored from a prebuilt index, with no XML directory behind it, is
+# shared frozen as it is. What the workers learn (formatted fragments,
+# instrumentation, profiles) travels back in the pickled environment and
+# is merged by `merge_info`; the dependencies of each document are merged
+# by depends.merge_info.
+
+import gc
+import os
+
+from . import get_doxygen_compounds, get_doxygen_root, get_doxygen_xml_dir, instrument, \
+        profiling, setup
+from .lazy import LazyCompounds
+
+# the reading processes are about to be forked
+_reading = False
+# set in the forked reading processes
+WORKER = False
+# the LazyCompounds installed for the workers, to remove after reading
+_installed = None
+
+
+def _after_fork():
+    global WORKER
+    if not _reading:
+        return
+    WORKER = True
+    instrument.reset()
+    profiling.reset()
+    from .xmlutils import format_cache
+    format_cache.hits = format_cache.misses = 0
+    if format_cache.store is not None:
+        format_cache.store.track()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def is_parallel(app, docnames):
+    """Whether Sphinx will read *docnames* in parallel, as decided by
+    Builder.read, which also needs every extension to be parallel read safe
+    """
+    from sphinx.util.parallel import parallel_available
+    return (parallel_available and len(docnames) > 5 and app.parallel > 1
+            and app.is_parallel_allowed('read'))
+
+
+def before_read(app, env, docnames):
+    """Get the shared state ready for the workers"""
+    global _reading, _installed
+    if not is_parallel(app, docnames):
+        return
+    _reading = True
+    # the workers can only read the compounds from the directory the tree
+    # was parsed from; a tree restored from a prebuilt index is shared as is
+    xml_dir = get_doxygen_xml_dir()
+    if (app.config.doxygen_parallel_lazy and get_doxygen_compounds() is None
+            and xml_dir is not None and os.path.isdir(xml_dir)):
+        _installed = setup.DOXYGEN_COMPOUNDS = LazyCompounds(
+            xml_dir, get_doxygen_root(),
+            maxsize=app.config.doxygen_xml_lazy_cache_size)
+    if hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+
+
+def after_read(app, env):
+    """Back to the main process's own tree once the workers are done"""
+    global _reading, _installed
+    if not _reading:
+        return []
+    _reading = False
+    if _installed is not None and get_doxygen_compounds() is _installed:
+        setup.DOXYGEN_COMPOUNDS = None
+    _installed = None
+    if hasattr(gc, 'unfreeze'):
+        gc.unfreeze()
+    return []
+
+
+def collect(app, doctree):
+    """Attach what this worker learnt to the environment sent back"""
+    if not WORKER:
+        return
+    from .xmlutils import format_cache
+    app.env.doxygen_format_memo = (format_cache.hits, format_cache.misses)
+    store = format_cache.store
+    if store is not None:
+        app.env.doxygen_fragments = (store.used, store.hits, store.misses)
+    if instrument.ENABLED:
+        app.env.doxygen_instrument = instrument.snapshot()
+    if profiling.profiles:
+        app.env.doxygen_profiles = profiling.snapshot()
+
+
+def merge_info(app, env, docnames, other):
+    """Take the fragments, the instrumentation and the profiles of a
+    worker
+    """
+    from .xmlutils import format_cache
+    hits, misses = getattr(other, 'doxygen_format_memo', (0, 0))
+    format_cache.hits += hits
+    format_cache.misses += misses
+    fragments = getattr(other, 'doxygen_fragments', None)
+    if fragments is not None and format_cache.store is not None:
+        format_cache.store.merge(fragments)
+    data = getattr(other, 'doxygen_instrument', None)
+    if data is not None:
+        instrument.merge(data)
+    data = getattr(other, 'doxygen_profiles', None)
+    if data is not None:
+        profiling.merge(data)
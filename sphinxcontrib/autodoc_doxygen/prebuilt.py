@@ -0,0 +1,114 @@
+from __future__ import print_function, absolute_import, division
+
+# Prebuilt index files.
+#
+# `autodoc-doxygen-index build <xml_dir> -o index.bin` parses and merges
+# the doxygen XML once, e.g. in the CI stage that runs doxygen, and writes
+# the merged tree to a compressed, versioned file. With `doxygen_xml_index`
+# pointing at it, set_doxygen_xml restores the tree with a single parse
+# instead of reading thousands of compound files; the XML directory
+# doesn't even have to be there. When it is, the index keeps a manifest of
+# the files like the XML cache does, and is only used if they match it.
+
+import argparse
+import os
+import pickle
+import sys
+import time
+import zlib
+
+from lxml import etree as ET
+
+from .cache import check_manifest
+from .loader import list_xml_files, parse_xml_files
+
+# Bump this whenever the layout of the index file changes
+INDEX_VERSION = 2
+
+MAGIC = 'autodoc_doxygen-index'
+
+
+def build_index(xml_dir, output):
+    """Parse the doxygen XML in *xml_dir* and write the merged tree to
+    *output*. Returns the number of files.
+    """
+    files = list_xml_files(xml_dir)
+    if not files:
+        raise ValueError('no doxygen xml output found in %s' % xml_dir)
+    root, manifest = parse_xml_files(files, with_digest=True)
+    data = {
+        'magic': MAGIC,
+        'version': INDEX_VERSION,
+        # file name -> (size, mtime, sha1), to tell an index of other XML;
+        # by name since the index is usually built on another machine
+        'files': dict((os.path.basename(f), entry) for f, entry in manifest.items()),
+        'xml': zlib.compress(ET.tostring(root, encoding='UTF-8'), 6),
+    }
+    dirname = os.path.dirname(output)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, output)
+    return len(files)
+
+
+def read_index(path):
+    """The data of the index file *path*, or None if it isn't a usable
+    index
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if (not isinstance(data, dict) or data.get('magic') != MAGIC
+            or data.get('version') != INDEX_VERSION):
+        return None
+    return data
+
+
+def matches(data, xml_dir):
+    """Whether the index was built from the XML in *xml_dir*: the same
+    files with the same content. As with the XML cache, files whose size
+    and mtime match are trusted and the others are hashed.
+    """
+    if not os.path.isdir(xml_dir):
+        return False
+    manifest = dict((os.path.join(xml_dir, name), entry)
+                    for name, entry in data['files'].items())
+    return check_manifest(manifest, list_xml_files(xml_dir)) is not None
+
+
+def restore_root(data):
+    """The merged root element of an index"""
+    return ET.fromstring(zlib.decompress(data['xml']), ET.XMLParser(huge_tree=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='autodoc-doxygen-index',
+        description='Prebuild the index of the doxygen XML for the doxygen_xml_index option')
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help='parse the doxygen XML and write the index')
+    build.add_argument('xml_dir', help='directory of the doxygen XML output')
+    build.add_argument('-o', '--output', default='index.bin', help='index file to write')
+    args = parser.parse_args(argv)
+    if args.command != 'build':
+        parser.print_help()
+        return 2
+
+    start = time.perf_counter()
+    try:
+        count = build_index(args.xml_dir, args.output)
+    except ValueError as e:
+        print('autodoc-doxygen-index: %s' % e, file=sys.stderr)
+        return 1
+    print('[autodoc_doxygen] indexed %d files in %.1fs, written to %s'
+          % (count, time.perf_counter() - start, args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
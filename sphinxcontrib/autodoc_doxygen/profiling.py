@@ -0,0 +1,170 @@
+from __future__ import print_function, absolute_import, division
+
+# Opt-in cProfile capture of the expensive entry points.
+#
+# `doxygen_profile` is a list of fnmatch patterns matched against the names
+# of the documented objects and documents. Every matching call of a wrapped
+# function is profiled into its own profile, one per (kind, name), and the
+# profiles are written as .pstats files when the build finishes along with
+# a merged report of the hottest functions.
+#
+# Profiles don't nest: while one is running, the calls it makes aren't
+# profiled separately (they are part of it already).
+#
+# With sphinx-build -j the documents are profiled in the forked readers.
+# Their statistics travel back in the pickled environment (see
+# parallel.collect) and are added to the profiles of the same name.
+
+import cProfile
+import fnmatch
+import functools
+import io
+import os
+import pstats
+import re
+
+patterns = []
+profiles = {}  # label -> cProfile.Profile
+collected = {}  # label -> [pstats statistics of the forked readers]
+_active = []
+
+
+class _Profiled(object):
+
+    __slots__ = ('profile',)
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def __enter__(self):
+        _active.append(self.profile)
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        _active.pop()
+        return False
+
+
+class _NotProfiled(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOT_PROFILED = _NotProfiled()
+
+
+def enable(new_patterns):
+    """Profile the calls whose names match one of *new_patterns*, forget
+    the profiles of the previous build
+    """
+    if isinstance(new_patterns, str):
+        new_patterns = [new_patterns]
+    patterns[:] = list(new_patterns or ())
+    reset()
+
+
+def reset():
+    """Forget the profiles, e.g. those a forked reader inherited"""
+    profiles.clear()
+    collected.clear()
+
+
+def snapshot():
+    """The statistics of the profiles of this process, for `merge`"""
+    return dict((label, pstats.Stats(prof).stats) for label, prof in profiles.items())
+
+
+def merge(data):
+    """Add the statistics of a `snapshot` taken in a forked reader"""
+    for label, stats in data.items():
+        collected.setdefault(label, []).append(stats)
+
+
+def labels():
+    """The names of the profiles of this process and the readers"""
+    return sorted(set(profiles) | set(collected))
+
+
+class _Collected(object):
+    # what pstats.Stats loads statistics from, like a cProfile.Profile
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def matches(*names):
+    for name in names:
+        if name and any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns):
+            return True
+    return False
+
+
+def profile(kind, name, *aliases):
+    """Context manager profiling the block into the *kind*.*name* profile
+    if *name* or one of the *aliases* (e.g. the docname) matches
+    """
+    if not patterns or _active or not matches(name, *aliases):
+        return _NOT_PROFILED
+    label = '%s.%s' % (kind, name)
+    prof = profiles.get(label)
+    if prof is None:
+        prof = profiles[label] = cProfile.Profile()
+    return _Profiled(prof)
+
+
+def profiled(kind, names):
+    """Decorator profiling the calls of the function, *names* is called with
+    the same arguments and returns the name of the call followed by its
+    aliases
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not patterns:
+                return func(*args, **kwargs)
+            with profile(kind, *names(*args, **kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def filename(label):
+    return re.sub(r'[^\w.-]+', '_', label) + '.pstats'
+
+
+def dump(outdir, top=20):
+    """Write a .pstats file per profile and the merged one to *outdir*,
+    returns the lines of the merged report of the *top* functions by
+    internal time (empty if nothing was profiled)
+    """
+    if not profiles and not collected:
+        return []
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    paths = []
+    for label in labels():
+        sources = [profiles[label]] if label in profiles else []
+        sources.extend(_Collected(dict(stats)) for stats in collected.get(label, ()))
+        path = os.path.join(outdir, filename(label))
+        pstats.Stats(*sources).dump_stats(path)
+        paths.append(path)
+
+    stream = io.StringIO()
+    merged = pstats.Stats(*paths, stream=stream)
+    merged.dump_stats(os.path.join(outdir, 'merged.pstats'))
+    merged.files = []  # don't list every file in the report
+    merged.strip_dirs().sort_stats('tottime').print_stats(top)
+    report = stream.getvalue()
+    with open(os.path.join(outdir, 'merged.txt'), 'w') as f:
+        f.write(report)
+    return report.strip('\n').splitlines()
@@ -0,0 +1,216 @@
+from __future__ import print_function, absolute_import, division
+
+# SQLite storage of the doxygen XML, for projects too large to hold in
+# memory.
+#
+# The compound files are imported one at a time into a database next to
+# the doctrees: every <compounddef> is stored as compressed XML, with
+# tables of its members and of every element with an id in it (members,
+# enum values, sections, anchors) pointing back to the compound, and the
+# position of each compound in index.xml keeps them in doxygen's order. The
+# lookups are indexed queries on those tables, and only the compounds that
+# are actually documented are parsed back, through the bounded LRU of
+# LazyCompounds. Files are imported again only when their size or mtime
+# changed, so an unchanged project reuses the database as it is.
+
+import os
+import sqlite3
+import zlib
+
+from lxml import etree as ET
+from sphinx.errors import ExtensionError
+
+from . import instrument
+from .lazy import LazyCompounds
+
+# Bump this whenever the schema or what is stored changes
+SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER);
+CREATE TABLE compounds (refid TEXT, kind TEXT, name TEXT, file TEXT, xml BLOB);
+CREATE TABLE members (compound TEXT, compoundname TEXT, section TEXT, kind TEXT,
+                      name TEXT, file TEXT, pos INTEGER);
+CREATE TABLE ids (id TEXT, compound TEXT, kind TEXT, in_file INTEGER, file TEXT,
+                  pos INTEGER);
+CREATE TABLE ordinals (refid TEXT PRIMARY KEY, pos INTEGER, file TEXT);
+CREATE INDEX compounds_refid ON compounds (refid);
+CREATE INDEX compounds_name ON compounds (name);
+CREATE INDEX compounds_file ON compounds (file);
+CREATE INDEX members_name ON members (compoundname, section, kind, name);
+CREATE INDEX members_file ON members (file);
+CREATE INDEX ids_id ON ids (id);
+CREATE INDEX ids_file ON ids (file);
+CREATE INDEX ordinals_file ON ordinals (file);
+'''
+
+
+def connect(path):
+    """Open the database at *path*, creating the tables if needed; a
+    database of ours with an outdated schema is dropped. Any other file at
+    *path* is left alone and raises an ExtensionError.
+    """
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    db = sqlite3.connect(path, check_same_thread=False)
+    try:
+        row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        ours = True
+    except sqlite3.DatabaseError:
+        row = None
+        try:
+            # a new or empty database is ours to fill
+            ours = db.execute('SELECT count(*) FROM sqlite_master').fetchone()[0] == 0
+        except sqlite3.DatabaseError:
+            ours = False
+    if not ours:
+        db.close()
+        raise ExtensionError(
+            '[sphinxcontrib-autodoc_doxygen] "%s" is not a database written by this '
+            'extension, remove it or set doxygen_sqlite_db to another path' % path)
+    if row is None or row[0] != str(SCHEMA_VERSION):
+        db.close()
+        if os.path.exists(path):
+            os.remove(path)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.executescript(SCHEMA)
+        db.execute("INSERT INTO meta VALUES ('version', ?)", (str(SCHEMA_VERSION),))
+        db.commit()
+    return db
+
+
+def _rows(path, node):
+    # the rows of the <compounddef> *node* of the file *path*
+    refid = node.get('id')
+    kind = node.get('kind')
+    name = node.findtext('compoundname')
+    in_file = int(kind == 'file')
+    compound = (refid, kind, name, path,
+                zlib.compress(ET.tostring(node, encoding='UTF-8'), 1))
+    members = []
+    for section in node.iterfind('sectiondef'):
+        for member in section.iterfind('memberdef'):
+            members.append((refid, name, section.get('kind'), member.get('kind'),
+                            member.findtext('name'), path, len(members)))
+    ids = [(element.get('id'), refid, element.tag, in_file, path, pos)
+           for pos, element in enumerate(node.xpath('descendant-or-self::*[@id]'))]
+    return compound, members, ids
+
+
+def _ordinals(path, root):
+    # the position of each compound in the doxygen index *root*
+    return [(compound.get('refid'), pos, path)
+            for pos, compound in enumerate(root.iterfind('compound'))]
+
+
+def import_xml(db, files):
+    """Bring the database up to date with the doxygen XML *files*.
+    Returns the number of files imported.
+    """
+    stored = dict((path, (size, mtime)) for path, size, mtime
+                  in db.execute('SELECT path, size, mtime FROM files'))
+    current = {}
+    for path in files:
+        st = os.stat(path)
+        current[path] = (st.st_size, st.st_mtime_ns)
+
+    changed = [path for path in files if stored.get(path) != current[path]]
+    removed = [path for path in stored if path not in current]
+    with db:
+        for path in removed + changed:
+            for table in ('compounds', 'members', 'ids', 'ordinals'):
+                db.execute('DELETE FROM %s WHERE file = ?' % table, (path,))
+            db.execute('DELETE FROM files WHERE path = ?', (path,))
+        for path in changed:
+            # one file at a time, so the whole project is never in memory
+            root = ET.parse(path).getroot()
+            if root.tag == 'doxygenindex':
+                db.executemany('INSERT OR REPLACE INTO ordinals VALUES (?, ?, ?)',
+                               _ordinals(path, root))
+            for node in root.iterfind('compounddef'):
+                compound, members, ids = _rows(path, node)
+                db.execute('INSERT INTO compounds VALUES (?, ?, ?, ?, ?)', compound)
+                db.executemany('INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?)', members)
+                db.executemany('INSERT INTO ids VALUES (?, ?, ?, ?, ?, ?)', ids)
+            db.execute('INSERT INTO files VALUES (?, ?, ?)', (path,) + current[path])
+    instrument.count('sqlite.files_imported', len(changed))
+    return len(changed)
+
+
+# the compounds in index.xml order, those it doesn't list (all of them
+# without an index.xml) go last in file order
+COMPOUNDS = ('SELECT c.refid, c.kind, c.name FROM compounds c '
+             'LEFT JOIN ordinals o ON o.refid = c.refid %s '
+             'ORDER BY o.pos IS NULL, o.pos, c.file, c.rowid')
+
+
+class SqliteCompounds(LazyCompounds):
+
+    def __init__(self, db_path, maxsize=256):
+        super().__init__(None, ET.Element('root'), maxsize=maxsize)
+        self.db_path = db_path
+        self._db = None
+        self._pid = None
+
+    @property
+    def db(self):
+        # forked readers open their own connection
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._db
+
+    def query(self, sql, *args):
+        instrument.count('sqlite.query')
+        return self.db.execute(sql, args).fetchall()
+
+    def index_root(self):
+        """An element with a <compound refid kind><name> for each compound,
+        in the order of index.xml, for the XPath queries listing them
+        """
+        root = ET.Element('root')
+        for refid, kind, name in self.query(COMPOUNDS % ''):
+            compound = ET.SubElement(root, 'compound', refid=refid, kind=kind)
+            ET.SubElement(compound, 'name').text = name
+        return root
+
+    def count(self):
+        return self.query('SELECT COUNT(*) FROM compounds')[0][0]
+
+    def _parse(self, refid):
+        rows = self.query('SELECT xml FROM compounds WHERE refid = ? LIMIT 1', refid)
+        if not rows:
+            return None
+        self.misses += 1
+        return ET.fromstring(zlib.decompress(rows[0][0]), ET.XMLParser(huge_tree=True))
+
+    def _refids(self, name):
+        return [refid for refid, _, _ in self.query(COMPOUNDS % 'WHERE c.name = ?', name)]
+
+    def find_members(self, compound_name, name, kind='function', section='func'):
+        """All the matching <memberdef>, see `DoxygenIndex.find_members`.
+        Only the compounds that have one are parsed.
+        """
+        members = []
+        refids = []
+        for refid, in self.query(
+                'SELECT compound FROM members WHERE compoundname = ? AND section = ? '
+                'AND kind = ? AND name = ? ORDER BY file, pos',
+                compound_name, section, kind, name):
+            if refid not in refids:
+                refids.append(refid)
+        for refid in refids:
+            if self.get(refid) is not None:
+                members.extend(self.loaded[refid].find_members(
+                    compound_name, name, kind=kind, section=section))
+        return members
+
+    def compound_of(self, refid):
+        """The refid of the compound that defines the element *refid*,
+        preferring a namespace over the file that lists its members
+        """
+        rows = self.query('SELECT compound FROM ids WHERE id = ? '
+                          'ORDER BY in_file, file, pos LIMIT 1', refid)
+        return rows[0][0] if rows else None
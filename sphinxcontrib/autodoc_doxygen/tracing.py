@@ -0,0 +1,161 @@
+from __future__ import print_function, absolute_import, division
+
+# Trace Event Format export of the extension's activity.
+#
+# Spans are recorded as complete ("X") events with the pid and thread of the
+# process they ran in, so the `sphinx-build -j` readers and the stub
+# scanning and rendering processes each get their own track in a viewer
+# (chrome://tracing, Perfetto...). Forked workers start with an empty
+# buffer and write it to <directory>/trace-<pid>.json when they exit, the
+# main process merges those files into one trace at the end of the build.
+
+import functools
+import glob
+import json
+import multiprocessing.util
+import os
+import threading
+import time
+
+ENABLED = False
+
+directory = None
+events = []
+_pid = None
+
+
+class _Span(object):
+
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        event = {
+            'name': self.name,
+            'cat': 'autodoc_doxygen',
+            'ph': 'X',
+            'ts': self.start * 1e6,
+            'dur': (end - self.start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+        }
+        if self.args:
+            event['args'] = self.args
+        _buffer().append(event)
+        return False
+
+
+class _NoSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+def _buffer():
+    global _pid
+    if os.getpid() != _pid:
+        # first event of a forked worker: drop the parent's events and
+        # write ours when the worker exits
+        _pid = os.getpid()
+        del events[:]
+        multiprocessing.util.Finalize(None, flush, exitpriority=10)
+    return events
+
+
+def enable(trace_directory):
+    """Record spans, workers write theirs to *trace_directory*"""
+    global ENABLED, directory, _pid
+    ENABLED = True
+    directory = trace_directory
+    _pid = os.getpid()
+    del events[:]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for path in glob.glob(os.path.join(directory, 'trace-*.json')):
+        os.remove(path)
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+    del events[:]
+
+
+def span(event, **args):
+    """Context manager recording the block as an *event* span, the keyword
+    arguments are shown with it
+    """
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(event, args)
+
+
+def traced(name, args=None):
+    """Decorator recording every call of the function as a *name* span,
+    *args* is called with the same arguments and returns the span's args
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            if not ENABLED:
+                return func(*a, **kw)
+            with _Span(name, args(*a, **kw) if args is not None else None):
+                return func(*a, **kw)
+        return wrapper
+    return decorator
+
+
+def flush():
+    """Write the events of this process to its trace-<pid>.json"""
+    if not ENABLED or not events:
+        return
+    path = os.path.join(directory, 'trace-%d.json' % os.getpid())
+    with open(path, 'w') as f:
+        json.dump(events, f)
+    del events[:]
+
+
+def merge(path):
+    """Write the events of this process and of every worker to *path* as
+    one trace, returns the number of events
+    """
+    merged = list(events)
+    worker_files = sorted(glob.glob(os.path.join(directory, 'trace-*.json')))
+    for worker_file in worker_files:
+        with open(worker_file) as f:
+            merged.extend(json.load(f))
+        os.remove(worker_file)
+    del events[:]
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
+
+    main = os.getpid()
+    pids = sorted(set(event['pid'] for event in merged) | {main})
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                 'args': {'name': 'sphinx-build' if pid == main else 'worker %d' % pid}}
+                for pid in pids]
+    # the main process first
+    metadata += [{'name': 'process_sort_index', 'ph': 'M', 'pid': pid, 'tid': 0,
+                  'args': {'sort_index': 0 if pid == main else 1}}
+                 for pid in pids]
+    merged.sort(key=lambda event: event['ts'])
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': metadata + merged, 'displayTimeUnit': 'ms'}, f)
+    return len(merged)
@@ -1,5 +1,12 @@
 from __future__ import print_function, absolute_import, division
-from . import get_doxygen_root
+import hashlib
+import os
+from collections import OrderedDict
+
+from lxml import etree as ET
+
+from . import get_doxygen_root, find_elements_by_id, get_description_flags, instrument
+from .index import LATEXONLY, HTMLONLY, LATEX_IMAGE
 
 # Need regular expressions to extract math labels
 import re
@@ -30,6 +37,135 @@ def flatten(xmlnode):
 
     return t
 
+class FormatCache(object):
+    """Memo of the format_xml_paragraph results.
+
+    The same description is formatted several times per build (summary
+    table, brief and full documenter output), so the lines are kept per
+    (element, build_mode, nsOrig used). Elements of a compound are keyed by
+    the compound id and their path (see `memo_key`) so the entries don't
+    keep the trees of the compounds the lazy and sqlite loaders evicted
+    alive, and a compound parsed again finds its descriptions. The cache
+    must be cleared whenever the doxygen XML is reloaded.
+    """
+
+    def __init__(self, maxsize=4096):
+        # maximum number of entries, 0 disables the cache
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # refid -> what visit_ref shows of it, for `fragment_key`
+        self.targets = {}
+        # `fragments.FragmentCache` consulted before formatting, or None
+        self.store = None
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self, maxsize=None):
+        if maxsize is not None:
+            self.maxsize = maxsize
+        self.entries.clear()
+        self.targets.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if not self.maxsize:
+            return
+        self.entries[key] = entry
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+format_cache = FormatCache()
+
+def formatter_version():
+    """Hash of the modules of the package, the rendered lines depend on this
+    one and on the lookups and flags of the others
+    """
+    h = hashlib.sha1()
+    package = os.path.dirname(os.path.abspath(__file__))
+    for dirpath, dirnames, filenames in sorted(os.walk(package)):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(('.py', '.rst')):
+                path = os.path.join(dirpath, filename)
+                h.update(os.path.relpath(path, package).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+    return h.hexdigest()
+
+def memo_key(xmlnode, build_mode, with_ns):
+    """Key of the in-memory memo: the id of the compound and the path of
+    the element below it rather than the element itself. Elements outside
+    of a compound are keyed by identity.
+    """
+    if ET.iselement(xmlnode):
+        if xmlnode.tag == 'compounddef':
+            compound = xmlnode
+        else:
+            compound = next(xmlnode.iterancestors('compounddef'), None)
+        if compound is not None:
+            # relative to the compound, the path in the merged tree counts
+            # thousands of siblings
+            return (compound.get('id'), ET.ElementTree(compound).getpath(xmlnode),
+                    build_mode, with_ns)
+    return (xmlnode, build_mode, with_ns)
+
+def _ref_target(refid):
+    # the name and compound of the element *refid*, which visit_ref renders
+    targets = format_cache.targets
+    if refid not in targets:
+        ref = find_elements_by_id(refid)
+        if ref:
+            ref = ref[0]
+            targets[refid] = (ref.tag, ref.get('kind'), ref.findtext('name'),
+                              [c.findtext('compoundname')
+                               for c in ref.iterancestors('compounddef')])
+        else:
+            targets[refid] = None
+    return targets[refid]
+
+def fragment_key(xmlnode, build_mode, with_ns):
+    """Key of the persistent fragment cache: everything the formatter
+    reads, the element itself, its feature flags (see scanNode) and the
+    elements it references
+    """
+    h = hashlib.sha1()
+    h.update(repr((build_mode, with_ns, get_description_flags(xmlnode))).encode('utf-8'))
+    h.update(ET.tostring(xmlnode, with_tail=False))
+    for node in xmlnode.iter('ref'):
+        h.update(repr(_ref_target(node.get('refid'))).encode('utf-8'))
+    return h.hexdigest()
+
+def _render(xmlnode, build_mode, with_ns):
+    # (lines, footnotes) of xmlnode, from the fragment cache if possible
+    store = format_cache.store
+    key = None
+    if store is not None and ET.iselement(xmlnode):
+        key = fragment_key(xmlnode, build_mode, with_ns)
+        entry = store.get(key)
+        if entry is not None:
+            return entry
+
+    with instrument.phase('format'):
+        if with_ns:
+            ns = _format_xml_paragraph(xmlnode, build_mode, nsOrig={})
+            entry = (tuple(ns['text']), tuple(ns.get('footnotes', ())))
+        else:
+            entry = (tuple(_format_xml_paragraph(xmlnode, build_mode)), ())
+    instrument.count('format.lines', len(entry[0]))
+    if key is not None:
+        store.put(key, *entry)
+    return entry
+
 def format_xml_paragraph(xmlnode,build_mode,nsOrig=None,verbosity=0):
     """Format an Doxygen XML segment (principally a detaileddescription)
     as a paragraph for inclusion in the rst document
@@ -43,6 +179,31 @@ def format_xml_paragraph(xmlnode,build_mode,nsOrig=None,verbosity=0):
     lines
         A list of lines.
     """
+    # the debug output is only printed while formatting, don't memoize then
+    if verbosity > 0:
+        return _format_xml_paragraph(xmlnode, build_mode, nsOrig=nsOrig, verbosity=verbosity)
+
+    key = memo_key(xmlnode, build_mode, nsOrig is not None)
+    entry = format_cache.get(key)
+    if entry is None:
+        # the footnotes the formatter would append to nsOrig are recorded
+        # and replayed below
+        entry = _render(xmlnode, build_mode, nsOrig is not None)
+        format_cache.put(key, entry)
+
+    # hand out copies, callers are free to modify the result
+    lines, footnotes = entry
+    if nsOrig is None:
+        return list(lines)
+    for footnote in footnotes:
+        if 'footnotes' in nsOrig:
+            nsOrig['footnotes'].append(footnote)
+        else:
+            nsOrig['footnotes'] = [footnote]
+    nsOrig['text'] = list(lines)
+    return nsOrig
+
+def _format_xml_paragraph(xmlnode,build_mode,nsOrig=None,verbosity=0):
     # Here we are operating on the entire document for the template
     # This helps support \footnotes{}
     if nsOrig is not None:
@@ -77,6 +238,7 @@ class _DoxygenXmlParagraphFormatter(object):
         self.verbosity = 0
         self.indent = -1
         self.options = []
+        self._handlers = type(self).dispatch_table()
 
     # new
     def setNS(self, ns):
@@ -85,6 +247,11 @@ class _DoxygenXmlParagraphFormatter(object):
     def setVerbosity(self, verbosity):
         self.verbosity = verbosity
         if self.verbosity > 0: print("[debug] verbosity = %s" % (self.verbosity))
+        # only pay for the tracing when it is asked for
+        if self.verbosity > 0:
+            self.visit = self._visit_traced
+        else:
+            self.__dict__.pop('visit', None)
 
     def visit_latexonly(self, node):
         if not(self.build_mode in ('latexpdf','latex')):
@@ -221,13 +388,34 @@ class _DoxygenXmlParagraphFormatter(object):
         self.blank_line()
 
     # Original
+    @classmethod
+    def dispatch_table(cls):
+        """tag -> visit_<tag> function of this class, built once per class"""
+        table = cls.__dict__.get('_dispatch')
+        if table is None:
+            table = {}
+            for name in dir(cls):
+                if name.startswith('visit_'):
+                    table[name[len('visit_'):]] = getattr(cls, name)
+            cls._dispatch = table
+        return table
+
     def visit(self, node):
-        method = 'visit_' + node.tag
-        if self.verbosity > 0: print("[debug] method=%s" % (method))
-        if len(self.math_labels) > 0 and node.tag != 'formula':
-          self.emit_math_labels()
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node)
+        tag = node.tag
+        if self.math_labels and tag != 'formula':
+            self.emit_math_labels()
+        # ref, emphasis, computeroutput, para... are all a single lookup,
+        # anything else goes through generic_visit. Testing the common tags
+        # first isn't any faster (see benchmarks/bench_visitor.py)
+        visitor = self._handlers.get(tag)
+        if visitor is None:
+            return self.generic_visit(node)
+        return visitor(self, node)
+
+    # visit() with debug output, used when verbosity is set
+    def _visit_traced(self, node):
+        print("[debug] method=visit_%s" % (node.tag))
+        return type(self).visit(self, node)
 
     def generic_visit(self, node, build_mode=None):
         if build_mode:
@@ -238,23 +426,24 @@ class _DoxygenXmlParagraphFormatter(object):
             if not('scanned' in self.options):
                 self.options.append('scanned')
                 self.scanNode(node)
-        for child in node.getchildren():
-            self.visit(child)
+        visit = self.visit
+        for child in node:
+            visit(child)
         return self
 
     # Scan the node and set appropriate options
+    # Only the subtree of the node counts, the flags are computed when the
+    # xml is loaded
     def scanNode(self, node):
-        xp = node.xpath('//latexonly')
-        if len(xp) > 0:
+        flags = get_description_flags(node)
+        if flags & LATEXONLY:
             self.options.append('latexonly')
-        xp = node.xpath('//htmlonly')
-        if len(xp) > 0:
+        if flags & HTMLONLY:
             self.options.append('htmlonly')
         #import pdb; pdb.set_trace()
 
         if 'latexonly' in self.options:
-            xp = node.xpath('//image[@type="latex"]')
-            if len(xp) > 0:
+            if flags & LATEX_IMAGE:
                 self.options.append('skipDoxyImage')
 
     # This is the original version with some debug
@@ -338,7 +527,7 @@ class _DoxygenXmlParagraphFormatter(object):
 
         # debug
         #if refid == 'General_Coordinate':
-        ref = get_doxygen_root().findall('.//*[@id="%s"]' % refid)
+        ref = find_elements_by_id(refid)
         if self.verbosity > 0: print("[debug] refid(%s) kindref(%s) ref(%s)" %
             (refid, node.get('kindref'), ref))
         #if refid.find('wright1997') >= 0:
@@ -725,8 +914,9 @@ class _DoxygenXmlParagraphFormatter(object):
         self.para_text(node.text)
 
         # visit children and append tail
-        for child in node.getchildren():
-            self.visit(child)
+        visit = self.visit
+        for child in node:
+            visit(child)
             self.continue_line = True
 
             if child.tail is not None:
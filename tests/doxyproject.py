@@ -0,0 +1,152 @@
+"""A small Fortran project with its doxygen XML, to build with Sphinx in
+the tests. The f domain is stubbed in conf.py so it doesn't need
+sphinx-fortran. `doxygen_root` sets the tree of the lookups directly.
+"""
+import io
+import os
+from contextlib import contextmanager
+
+import sphinxcontrib.autodoc_doxygen
+
+INDEX_RST = '''Index
+=====
+
+.. toctree::
+   :glob:
+
+   api/*
+
+.. autodoxysummary::
+   :toctree: api
+   :generate:
+   :kind: mod
+
+.. autodoxysummary::
+   :toctree: api
+   :generate:
+   :kind: page
+'''
+
+CONF = '''import os
+extensions = ['sphinxcontrib.autodoc_doxygen']
+autosummary_generate = ['index.rst']
+master_doc = 'index'
+doxygen_xml = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'xml')
+
+from docutils import nodes
+from docutils.parsers.rst import Directive
+from sphinx.domains import Domain
+
+class FDirective(Directive):
+    has_content = True
+    optional_arguments = 20
+    final_argument_whitespace = True
+
+    def run(self):
+        node = nodes.container()
+        node += nodes.literal_block(text=self.name + ' ' + ' '.join(self.arguments))
+        self.state.nested_parse(self.content, self.content_offset, node)
+        return [node]
+
+def f_role(name, rawtext, text, lineno, inliner, options={}, content=[]):
+    return [nodes.literal(rawtext, rawtext)], []
+
+class FDomain(Domain):
+    name = 'f'
+    directives = {'module': FDirective, 'function': FDirective,
+                  'subroutine': FDirective, 'type': FDirective}
+    roles = {'func': f_role, 'mod': f_role, 'type': f_role}
+
+    def merge_domaindata(self, docnames, otherdata):
+        pass
+
+def setup(app):
+    app.add_config_value('sphinx_build_mode', 'html', 'env')
+    app.add_domain(FDomain)
+    return {'parallel_read_safe': True}
+'''
+
+MODULE = '''<doxygen><compounddef id="%(mid)s" kind="namespace" language="Fortran">
+<compoundname>%(mod)s</compoundname>
+<sectiondef kind="func">
+<memberdef kind="function" id="%(mid)s_1a01" prot="public" static="no">
+<type>subroutine</type><definition>subroutine %(mod)s::step</definition>
+<argsstring>(a)</argsstring><name>step</name>
+<briefdescription><para>Steps %(mod)s forward. Really.</para></briefdescription>
+<detaileddescription><para>Calls <ref refid="%(other)s_1a01" kindref="member">step</ref> with <emphasis>care</emphasis>.</para></detaileddescription>
+</memberdef>
+</sectiondef>
+<briefdescription><para>Module %(mod)s does things.</para></briefdescription>
+<detaileddescription><para>See the <ref refid="page%(m)d" kindref="compound">page</ref>.</para></detaileddescription>
+</compounddef></doxygen>'''
+
+PAGE = '''<doxygen><compounddef id="page%(m)d" kind="page">
+<compoundname>page%(m)d</compoundname><title>Page %(m)d</title>
+<briefdescription></briefdescription>
+<detaileddescription><para>About <ref refid="%(mid)s" kindref="compound">%(mod)s</ref>.</para></detaileddescription>
+</compounddef></doxygen>'''
+
+
+def write_project(path, modules=6, names=None):
+    """Write the XML to *path*/xml and the Sphinx sources to *path*/src,
+    returns the source directory. *names* are the module names in
+    index.xml order, ``mod_0``... by default.
+    """
+    names = names or ['mod_%d' % m for m in range(modules)]
+    xml_dir = os.path.join(path, 'xml')
+    srcdir = os.path.join(path, 'src')
+    os.makedirs(xml_dir)
+    os.makedirs(srcdir)
+
+    index = ['<doxygenindex>']
+    for m, mod in enumerate(names):
+        mid = 'namespace' + mod.replace('_', '__')
+        other = 'namespace' + names[(m + 1) % len(names)].replace('_', '__')
+        index.append('<compound refid="%s" kind="namespace"><name>%s</name>'
+                     '<member refid="%s_1a01" kind="function"><name>step</name></member>'
+                     '</compound>' % (mid, mod, mid))
+        index.append('<compound refid="page%d" kind="page"><name>page%d</name></compound>' % (m, m))
+        values = dict(mid=mid, mod=mod, m=m, other=other)
+        with open(os.path.join(xml_dir, mid + '.xml'), 'w') as f:
+            f.write(MODULE % values)
+        with open(os.path.join(xml_dir, 'page%d.xml' % m), 'w') as f:
+            f.write(PAGE % values)
+    index.append('</doxygenindex>')
+    with open(os.path.join(xml_dir, 'index.xml'), 'w') as f:
+        f.write('\n'.join(index))
+
+    with open(os.path.join(srcdir, 'conf.py'), 'w') as f:
+        f.write(CONF)
+    with open(os.path.join(srcdir, 'index.rst'), 'w') as f:
+        f.write(INDEX_RST)
+    return srcdir
+
+
+def build(srcdir, outdir, parallel=1, **overrides):
+    """Build the project as html, returns the Sphinx application"""
+    from sphinx.application import Sphinx
+    app = Sphinx(srcdir, srcdir, os.path.join(outdir, 'html'), os.path.join(outdir, 'doctrees'),
+                 'html', confoverrides=overrides, status=None, warning=io.StringIO(),
+                 freshenv=True, parallel=parallel)
+    app.build()
+    return app
+
+
+@contextmanager
+def doxygen_root(node):
+    """Look up the compounds in *node*, instead of a loaded project, for
+    the duration of the block
+    """
+    setup = sphinxcontrib.autodoc_doxygen.setup
+    names = ('DOXYGEN_ROOT', 'DOXYGEN_COMPOUNDS')
+    saved = dict((name, getattr(setup, name)) for name in names if hasattr(setup, name))
+    setup.DOXYGEN_ROOT = node
+    setup.DOXYGEN_COMPOUNDS = None
+    try:
+        yield node
+    finally:
+        for name in names:
+            if name in saved:
+                setattr(setup, name, saved[name])
+            else:
+                delattr(setup, name)
@@ -0,0 +1,75 @@
+import os
+from types import SimpleNamespace
+
+import lxml.etree as ET
+import pytest
+
+from sphinxcontrib.autodoc_doxygen import depends
+from doxyproject import doxygen_root
+
+
+XML = '''<root>
+  <compounddef id="namespacemom__eos" kind="namespace">
+    <compoundname>mom_eos</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacemom__eos_1a01">
+        <name>calculate_density</name>
+        <briefdescription><para>See <ref refid="namespacemom__grid_1a02">grid</ref>.</para></briefdescription>
+      </memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="namespacemom__grid" kind="namespace">
+    <compoundname>mom_grid</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacemom__grid_1a02"><name>set_grid</name></memberdef>
+    </sectiondef>
+  </compounddef>
+</root>'''
+
+
+@pytest.fixture
+def root():
+    with doxygen_root(ET.fromstring(XML)) as node:
+        yield node
+
+
+def test_get_outdated(tmpdir, root):
+    for refid in ('namespacemom__eos', 'namespacemom__grid', 'index'):
+        tmpdir.join(refid + '.xml').write('<doxygen/>')
+    app = SimpleNamespace(config=SimpleNamespace(doxygen_xml=str(tmpdir), doxygen_xml_index=''))
+    env = SimpleNamespace(docname='api/mom_eos', temp_data={})
+
+    member = root.find('.//memberdef')
+    depends.note_element(env, member)
+    env.docname, env.temp_data = 'index', {}
+    depends.note_index(env)
+    assert env.doxygen_deps == {'api/mom_eos': {'namespacemom__eos', 'namespacemom__grid'},
+                                'index': {'index'}}
+
+    depends.update_digests(app, env)
+    assert depends.get_outdated(app, env, set(), set(), set()) == []
+
+    # the linked compound changed
+    tmpdir.join('namespacemom__grid.xml').write('<doxygen></doxygen>')
+    assert depends.get_outdated(app, env, set(), set(), set()) == ['api/mom_eos']
+    os.remove(str(tmpdir.join('index.xml')))
+    assert sorted(depends.get_outdated(app, env, set(), set(), {'api/mom_eos'})) == ['index']
+
+    depends.purge_doc(app, env, 'index')
+    assert list(env.doxygen_deps) == ['api/mom_eos']
+
+
+def test_get_outdated_prebuilt(tmpdir, root):
+    # only the prebuilt index is there, not the XML it was built from
+    tmpdir.join('index.bin').write('v1')
+    app = SimpleNamespace(confdir=str(tmpdir), config=SimpleNamespace(
+        doxygen_xml=str(tmpdir.join('xml')), doxygen_xml_index='index.bin'))
+    env = SimpleNamespace(docname='api/mom_eos', temp_data={})
+    depends.note_element(env, root.find('.//memberdef'))
+    env.docname, env.temp_data = 'intro', {}
+    depends.update_digests(app, env)
+    assert list(env.doxygen_digests) == [depends.PREBUILT]
+    assert depends.get_outdated(app, env, set(), set(), set()) == []
+
+    tmpdir.join('index.bin').write('v2')
+    assert depends.get_outdated(app, env, set(), set(), set()) == ['api/mom_eos']
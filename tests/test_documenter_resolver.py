@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+import lxml.etree as ET
+from sphinx.ext.autodoc import AttributeDocumenter, FunctionDocumenter
+
+from sphinxcontrib.autodoc_doxygen.autodoc import documenter_resolver, \
+        DoxygenMethodDocumenter, DoxygenModuleDocumenter, DoxygenTypeDocumenter
+
+
+class CountingMethodDocumenter(DoxygenMethodDocumenter):
+    calls = 0
+
+    @classmethod
+    def can_document_member(cls, member, membername, isattr, parent):
+        cls.calls += 1
+        return super().can_document_member(member, membername, isattr, parent)
+
+
+def test_resolver():
+    documenters = OrderedDict([
+        ('function', FunctionDocumenter),
+        ('attribute', AttributeDocumenter),
+        ('doxymethod', CountingMethodDocumenter),
+        ('doxytype', DoxygenTypeDocumenter),
+    ])
+    parent = DoxygenModuleDocumenter.__new__(DoxygenModuleDocumenter)
+    func = ET.fromstring('<memberdef kind="function" id="f1"><name>f</name></memberdef>')
+    other = ET.fromstring('<memberdef kind="function" id="f2"><name>g</name></memberdef>')
+    type_ = ET.fromstring('<compounddef kind="type" id="t1"/>')
+
+    resolve = documenter_resolver(documenters)
+    assert resolve(func, 'f', False, parent) is CountingMethodDocumenter
+    assert resolve(other, 'g', False, parent) is CountingMethodDocumenter
+    assert CountingMethodDocumenter.calls == 1
+    assert resolve(type_, 'm::t', False, parent) is DoxygenTypeDocumenter
+
+    # a new registration drops the cache
+    class Preferred(DoxygenMethodDocumenter):
+        priority = DoxygenMethodDocumenter.priority + 1
+
+    documenters['preferred'] = Preferred
+    resolve = documenter_resolver(documenters)
+    assert resolve(func, 'f', False, parent) is Preferred
@@ -0,0 +1,77 @@
+import os
+
+from lxml import etree as ET
+
+from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, format_cache
+
+
+def test_memo():
+    format_cache.clear(maxsize=2)
+    node = ET.fromstring('<detaileddescription><para>Some text</para></detaileddescription>')
+
+    first = format_xml_paragraph(node, 'html')
+    first.append('changed by the caller')
+    assert format_xml_paragraph(node, 'html') == first[:-1]
+    assert (format_cache.hits, format_cache.misses) == (1, 1)
+
+    # another build mode is a separate entry
+    format_xml_paragraph(node, 'latexpdf')
+    assert (format_cache.hits, format_cache.misses) == (1, 2)
+
+    # verbose output isn't memoized
+    format_xml_paragraph(node, 'html', verbosity=1)
+    assert (format_cache.hits, format_cache.misses) == (1, 2)
+
+    other = ET.fromstring('<briefdescription><para>Other</para></briefdescription>')
+    format_xml_paragraph(other, 'html')
+    assert len(format_cache.entries) == 2
+    format_cache.clear(maxsize=4096)
+
+
+def test_memo_footnotes():
+    format_cache.clear()
+    node = ET.fromstring('<detaileddescription><para>Text<sup title="a note"/></para></detaileddescription>')
+
+    ns = format_xml_paragraph(node, 'html', nsOrig={})
+    again = format_xml_paragraph(node, 'html', nsOrig={'footnotes': ['first']})
+    assert format_cache.hits == 1
+    assert again['text'] == ns['text']
+    assert ns['footnotes'] == ['a note']
+    assert again['footnotes'] == ['first', 'a note']
+
+
+def test_scan_is_local():
+    # htmlonly elsewhere in the document doesn't disable the footnote
+    root = ET.fromstring('''<root>
+  <detaileddescription><para><htmlonly>y</htmlonly></para></detaileddescription>
+  <detaileddescription><para>Text<sup title="a note"/></para></detaileddescription>
+</root>''')
+    format_cache.clear()
+    ns = format_xml_paragraph(root[1], 'html', nsOrig={})
+    assert ns['footnotes'] == ['a note']
+    assert '[#]_' in '\n'.join(ns['text'])
+
+
+def test_memo_releases_evicted_compounds(tmpdir):
+    import gc
+    from doxyproject import write_project
+    from sphinxcontrib.autodoc_doxygen.lazy import LazyCompounds
+    write_project(str(tmpdir), modules=6)
+    xml_dir = str(tmpdir.join('xml'))
+    compounds = LazyCompounds(xml_dir, ET.parse(os.path.join(xml_dir, 'index.xml')).getroot(),
+                              maxsize=2)
+    refids = ['namespacemod__%d' % m for m in range(6)]
+
+    format_cache.clear()
+    for refid in refids:
+        format_xml_paragraph(compounds.get(refid).find('detaileddescription'), 'html')
+    assert format_cache.misses == 6
+    gc.collect()
+    live = set(compound.get('id') for obj in gc.get_objects() if ET.iselement(obj)
+               for compound in obj.getroottree().iter('compounddef'))
+    assert live == set(compounds.loaded) == set(refids[-2:])
+
+    # a compound parsed again finds its descriptions
+    format_xml_paragraph(compounds.get(refids[0]).find('detaileddescription'), 'html')
+    assert (format_cache.hits, format_cache.misses) == (1, 6)
+    format_cache.clear()
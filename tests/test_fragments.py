@@ -0,0 +1,62 @@
+from lxml import etree as ET
+
+from sphinxcontrib.autodoc_doxygen.fragments import FragmentCache
+from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, format_cache, fragment_key
+
+
+def format_with_store(cache_file, node):
+    store = FragmentCache(cache_file, 'v1')
+    store.load()
+    format_cache.clear()
+    format_cache.store = store
+    try:
+        return format_xml_paragraph(node, 'html'), store
+    finally:
+        format_cache.store = None
+        store.save()
+
+
+def test_persistence(tmpdir):
+    cache_file = str(tmpdir.join('fragments'))
+    node = ET.fromstring('<detaileddescription><para>Some text</para></detaileddescription>')
+
+    lines, store = format_with_store(cache_file, node)
+    assert (store.hits, store.misses) == (0, 1)
+
+    # a new build reuses the lines of the same XML
+    again, store = format_with_store(cache_file, ET.fromstring(ET.tostring(node)))
+    assert again == lines
+    assert (store.hits, store.misses) == (1, 0)
+
+    changed = ET.fromstring('<detaileddescription><para>Other text</para></detaileddescription>')
+    _, store = format_with_store(cache_file, changed)
+    assert (store.hits, store.misses) == (0, 1)
+
+    # entries of another formatter version are ignored
+    store = FragmentCache(cache_file, 'v2')
+    store.load()
+    assert store.entries == {}
+
+
+def test_key():
+    node = ET.fromstring('<para>See <ref refid="missing" kindref="member">x</ref></para>')
+    key = fragment_key(node, 'html', False)
+    assert key == fragment_key(ET.fromstring(ET.tostring(node)), 'html', False)
+    assert key != fragment_key(node, 'latexpdf', False)
+
+
+def test_merge(tmpdir):
+    cache_file = str(tmpdir.join('fragments'))
+    store = FragmentCache(cache_file, 'v1')
+    store.put('a', ('old',), ())
+
+    # what a forked reader sends back
+    worker = FragmentCache(cache_file, 'v1')
+    worker.entries = dict(store.entries)
+    worker.track()
+    worker.get('a')
+    worker.put('b', ('new',), ())
+    store.merge((worker.used, worker.hits, worker.misses))
+
+    assert (store.hits, store.misses) == (1, 0)
+    assert store.get('b') == (('new',), ())
@@ -0,0 +1,75 @@
+import lxml.etree as ET
+
+from sphinxcontrib.autodoc_doxygen.index import DoxygenIndex, description_flags, LATEXONLY, HTMLONLY, LATEX_IMAGE
+
+
+XML = '''<root>
+  <compounddef id="mom__eos_8F90" kind="file">
+    <compoundname>MOM_EOS.F90</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="namespacemom__eos" kind="namespace">
+    <compoundname>mom_eos</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+    </sectiondef>
+  </compounddef>
+</root>'''
+
+
+def test_find_id():
+    index = DoxygenIndex(ET.fromstring(XML))
+
+    assert index.find_compounddef('namespacemom__eos').findtext('compoundname') == 'mom_eos'
+    assert index.find_compounddef('namespacemom__eos_1a01') is None
+    assert index.find_id('missing') == []
+
+    # the namespace definition comes before the copy in the file compound
+    members = index.find_id('namespacemom__eos_1a01')
+    assert [m.xpath('ancestor::compounddef/@kind')[0] for m in members] == ['namespace', 'file']
+
+
+def test_find_by_name():
+    index = DoxygenIndex(ET.fromstring(XML.replace(
+        '</sectiondef>\n  </compounddef>\n</root>',
+        '''  <memberdef kind="function" id="namespacemom__eos_1a02"><name>calculate_density</name></memberdef>
+    </sectiondef>
+  </compounddef>
+  <compounddef id="namespacequote" kind="namespace"><compoundname>a"b</compoundname></compounddef>
+</root>''')))
+
+    assert [c.get('id') for c in index.find_by_name('mom_eos')] == ['namespacemom__eos']
+    assert [c.get('id') for c in index.find_by_name('a"b')] == ['namespacequote']
+    assert index.find_by_name('missing') == []
+
+    # overloads keep their document order
+    members = index.find_members('mom_eos', 'calculate_density')
+    assert [m.get('id') for m in members] == ['namespacemom__eos_1a01', 'namespacemom__eos_1a02']
+    assert index.find_members('mom_eos', 'calculate_density', kind='variable') == []
+
+
+def test_description_flags():
+    root = ET.fromstring('''<root>
+  <compounddef id="page1" kind="page">
+    <compoundname>page1</compoundname>
+    <briefdescription><para>Brief</para></briefdescription>
+    <detaileddescription><para><latexonly>x</latexonly><image type="latex" name="a.eps"/></para></detaileddescription>
+  </compounddef>
+  <compounddef id="page2" kind="page">
+    <compoundname>page2</compoundname>
+    <detaileddescription><para><htmlonly>y</htmlonly><image type="html" name="a.png"/></para></detaileddescription>
+  </compounddef>
+</root>''')
+    index = DoxygenIndex(root)
+
+    brief, detailed1, detailed2 = root.iter('briefdescription', 'detaileddescription')
+    assert index.find_flags(brief) == 0
+    assert index.find_flags(detailed1) == LATEXONLY | LATEX_IMAGE
+    assert index.find_flags(detailed2) == HTMLONLY
+    assert index.find_flags(root) is None
+
+    # same answer when computed from the subtree alone
+    for node in (brief, detailed1, detailed2):
+        assert description_flags(node) == index.find_flags(node)
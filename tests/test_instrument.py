@@ -0,0 +1,66 @@
+from lxml import etree as ET
+
+from sphinxcontrib.autodoc_doxygen import instrument
+from sphinxcontrib.autodoc_doxygen.xmlutils import format_xml_paragraph, format_cache
+
+
+def test_disabled():
+    instrument.enable(False)
+    instrument.reset()
+    with instrument.phase('format'):
+        instrument.count('xpath')
+    assert instrument.snapshot() == {'phases': {}, 'counters': {}}
+
+
+def test_phases_and_counters():
+    instrument.enable(True)
+    instrument.reset()
+    try:
+        @instrument.timed('outer')
+        def outer():
+            with instrument.phase('inner'):
+                instrument.count('xpath', 2)
+            return 42
+
+        assert outer() == 42
+        outer()
+        data = instrument.snapshot({'format_memo.hit': 3})
+    finally:
+        instrument.enable(False)
+        instrument.reset()
+
+    assert data['phases']['outer']['calls'] == 2
+    assert data['phases']['inner']['calls'] == 2
+    # phases are inclusive
+    assert data['phases']['outer']['total'] >= data['phases']['inner']['total']
+    assert data['counters'] == {'xpath': 4, 'format_memo.hit': 3}
+    lines = instrument.format_report(data)
+    assert lines[1].split()[0] == 'outer'
+
+
+def test_format_is_timed():
+    format_cache.clear()
+    node = ET.fromstring('<detaileddescription><para>Some text</para></detaileddescription>')
+    instrument.enable(True)
+    instrument.reset()
+    try:
+        lines = format_xml_paragraph(node, 'html')
+        format_xml_paragraph(node, 'html')
+        data = instrument.snapshot()
+    finally:
+        instrument.enable(False)
+        instrument.reset()
+
+    # the second call is a memo hit, it isn't formatted again
+    assert data['phases']['format']['calls'] == 1
+    assert data['counters']['format.lines'] == len(lines)
+
+
+def test_merge():
+    instrument.reset()
+    instrument.timings['format'] = [1, 0.5]
+    instrument.merge({'phases': {'format': {'calls': 2, 'total': 1.0}},
+                      'counters': {'xpath': 3}})
+    assert instrument.snapshot() == {'phases': {'format': {'calls': 3, 'total': 1.5}},
+                                     'counters': {'xpath': 3}}
+    instrument.reset()
@@ -0,0 +1,65 @@
+import lxml.etree as ET
+
+from sphinxcontrib.autodoc_doxygen.lazy import LazyCompounds
+
+
+INDEX = '''<doxygenindex>
+  <compound refid="mom__eos_8F90" kind="file"><name>MOM_EOS.F90</name>
+    <member refid="namespacemom__eos_1a01" kind="function"><name>calculate_density</name></member>
+  </compound>
+  <compound refid="namespacemom__eos" kind="namespace"><name>mom_eos</name>
+    <member refid="namespacemom__eos_1a01" kind="function"><name>calculate_density</name></member>
+  </compound>
+  <compound refid="EOS__page" kind="page"><name>EOS_page</name></compound>
+</doxygenindex>'''
+
+FILES = {
+    'mom__eos_8F90': '<compounddef id="mom__eos_8F90" kind="file"><compoundname>MOM_EOS.F90</compoundname></compounddef>',
+    'namespacemom__eos': '''<compounddef id="namespacemom__eos" kind="namespace">
+  <compoundname>mom_eos</compoundname>
+  <sectiondef kind="func">
+    <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+  </sectiondef>
+</compounddef>''',
+    'EOS__page': '''<compounddef id="EOS__page" kind="page">
+  <compoundname>EOS_page</compoundname>
+  <detaileddescription><sect1 id="EOS__page_1section__eos"><title>EOS</title></sect1></detaileddescription>
+</compounddef>''',
+}
+
+
+def make_compounds(tmpdir, maxsize=256):
+    for refid, xml in FILES.items():
+        tmpdir.join(refid + '.xml').write('<doxygen>%s</doxygen>' % xml)
+    return LazyCompounds(str(tmpdir), ET.fromstring(INDEX), maxsize=maxsize)
+
+
+def test_lookups(tmpdir):
+    compounds = make_compounds(tmpdir)
+    assert compounds.loaded == {}
+
+    assert compounds.get('namespacemom__eos').findtext('compoundname') == 'mom_eos'
+    assert compounds.get('missing') is None
+    assert [c.get('id') for c in compounds.get_by_name('mom_eos')] == ['namespacemom__eos']
+
+    # members are found in the namespace rather than the file listing them
+    member, = compounds.find_id('namespacemom__eos_1a01')
+    assert member.tag == 'memberdef'
+    assert member.xpath('./ancestor::compounddef/compoundname')[0].text == 'mom_eos'
+
+    assert compounds.find_members('mom_eos', 'calculate_density') == [member]
+    assert compounds.find_members('MOM_EOS.F90', 'calculate_density') == []
+
+    # sections are resolved through the compound part of their id
+    section, = compounds.find_id('EOS__page_1section__eos')
+    assert section.tag == 'sect1'
+
+
+def test_eviction(tmpdir):
+    compounds = make_compounds(tmpdir, maxsize=2)
+    compounds.get('mom__eos_8F90')
+    compounds.get('namespacemom__eos')
+    compounds.get('mom__eos_8F90')
+    compounds.get('EOS__page')
+    assert list(compounds.loaded) == ['mom__eos_8F90', 'EOS__page']
+    assert (compounds.hits, compounds.misses) == (1, 3)
@@ -0,0 +1,26 @@
+import lxml.etree as ET
+
+from sphinxcontrib.autodoc_doxygen.loader import parse_xml_files
+
+
+def test_merge_in_file_order(tmpdir):
+    files = []
+    for i in range(12):
+        path = str(tmpdir.join('namespace%02d.xml' % i))
+        with open(path, 'w') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<doxygen xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+                    '<compounddef id="namespace%02d" kind="namespace">'
+                    '<compoundname>mod_%d</compoundname>'
+                    '<briefdescription><para>Caf\xe9 %d</para></briefdescription>'
+                    '</compounddef>\n</doxygen>' % (i, i, i))
+        files.append(path)
+
+    root, manifest = parse_xml_files(files)
+    assert manifest == {}
+    digested, manifest = parse_xml_files(files[::-1], with_digest=True)
+
+    assert [e.get('id') for e in root] == ['namespace%02d' % i for i in range(12)]
+    assert [e.get('id') for e in digested] == ['namespace%02d' % i for i in range(11, -1, -1)]
+    assert ET.tostring(root[0]) == ET.tostring(digested[-1])
+    assert sorted(manifest) == sorted(files)
@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+
+from doxyproject import write_project, build
+from sphinxcontrib.autodoc_doxygen import get_doxygen_compounds
+from sphinxcontrib.autodoc_doxygen.parallel import is_parallel
+from sphinxcontrib.autodoc_doxygen.prebuilt import build_index
+
+
+def read_html(outdir, name):
+    with open(os.path.join(outdir, 'html', 'api', name + '.html')) as f:
+        html = f.read()
+    return html[html.index('<div class="body"'):html.index('<div class="sphinxsidebar"')]
+
+
+def test_parallel_prebuilt_index(tmpdir):
+    # the XML is only there to build the index, like in a separate CI stage
+    srcdir = write_project(str(tmpdir))
+    index = str(tmpdir.join('index.bin'))
+    build_index(str(tmpdir.join('xml')), index)
+    serial = str(tmpdir.join('serial'))
+    build(srcdir, serial, doxygen_xml_index=index)
+    shutil.rmtree(str(tmpdir.join('xml')))
+    shutil.rmtree(os.path.join(srcdir, 'api'))
+
+    parallel = str(tmpdir.join('parallel'))
+    build(srcdir, parallel, parallel=2, doxygen_xml_index=index)
+    for name in ('mod_0', 'mod_5', 'page3'):
+        assert read_html(parallel, name) == read_html(serial, name)
+
+
+def test_parallel_needs_safe_extensions(tmpdir):
+    # an extension that isn't parallel read safe makes Sphinx read serially
+    srcdir = write_project(str(tmpdir))
+    with open(os.path.join(srcdir, 'conf.py'), 'a') as f:
+        f.write("\nextensions.append('unsafe')\n")
+    with open(os.path.join(srcdir, 'unsafe.py'), 'w') as f:
+        f.write("def setup(app):\n    return {'parallel_read_safe': False}\n")
+    sys.path.insert(0, srcdir)
+    try:
+        app = build(srcdir, str(tmpdir.join('out')), parallel=2)
+    finally:
+        sys.path.remove(srcdir)
+    assert not is_parallel(app, ['doc%d' % i for i in range(10)])
+    assert get_doxygen_compounds() is None
+
+
+def test_parallel_profiles(tmpdir):
+    # the documents read by the forked readers are profiled too
+    srcdir = write_project(str(tmpdir))
+    outdir = str(tmpdir.join('out'))
+    build(srcdir, outdir, parallel=2, doxygen_profile=['api/*'])
+    profiles = sorted(os.listdir(os.path.join(outdir, 'html', '_profile')))
+    assert 'doxymodule.mod_0.pstats' in profiles
+    assert 'doxymodule.mod_5.pstats' in profiles
@@ -0,0 +1,40 @@
+import os
+
+from sphinxcontrib.autodoc_doxygen import load_xml_index
+from sphinxcontrib.autodoc_doxygen.prebuilt import main
+
+
+def test_build_and_load(tmpdir):
+    xml_dir = tmpdir.mkdir('xml')
+    xml_dir.join('namespacemom__eos.xml').write(
+        '<doxygen><compounddef id="namespacemom__eos" kind="namespace">'
+        '<compoundname>mom_eos</compoundname></compounddef></doxygen>')
+    xml_dir.join('index.xml').write(
+        '<doxygenindex><compound refid="namespacemom__eos" kind="namespace">'
+        '<name>mom_eos</name></compound></doxygenindex>')
+    index = str(tmpdir.join('out', 'index.bin'))
+    assert main(['build', str(xml_dir), '-o', index]) == 0
+
+    root = load_xml_index(index, str(xml_dir))
+    assert [node.tag for node in root] == ['compound', 'compounddef']
+    # the XML doesn't need to be there
+    assert load_xml_index(index, str(tmpdir.join('missing'))) is not None
+
+    xml_dir.join('index.xml').write('<doxygenindex/>')
+    assert load_xml_index(index, str(xml_dir)) is None
+    assert load_xml_index(str(xml_dir.join('index.xml')), str(xml_dir)) is None
+    assert main(['build', str(tmpdir.mkdir('empty')), '-o', index]) == 1
+
+
+def test_content_change(tmpdir):
+    xml_dir = tmpdir.mkdir('xml')
+    xml_dir.join('index.xml').write('<doxygenindex><compound refid="a" kind="page"/></doxygenindex>')
+    index = str(tmpdir.join('index.bin'))
+    assert main(['build', str(xml_dir), '-o', index]) == 0
+
+    # a new mtime alone is fine
+    os.utime(str(xml_dir.join('index.xml')), (0, 0))
+    assert load_xml_index(index, str(xml_dir)) is not None
+    # the same size with other content isn't
+    xml_dir.join('index.xml').write('<doxygenindex><compound refid="b" kind="page"/></doxygenindex>')
+    assert load_xml_index(index, str(xml_dir)) is None
@@ -0,0 +1,42 @@
+import os
+import pstats
+
+from sphinxcontrib.autodoc_doxygen import profiling
+
+
+def work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiled(tmpdir):
+    profiling.enable(['mom_*'])
+    try:
+        @profiling.profiled('doxymodule', lambda name, n: (name, 'api/' + name))
+        def document(name, n):
+            # nested calls are part of the outer profile
+            with profiling.profile('doxymethod', name + '::inner'):
+                return work(n)
+
+        assert document('mom_eos', 1000) == work(1000)
+        document('mom_eos', 10)
+        document('other', 10)
+        assert list(profiling.profiles) == ['doxymodule.mom_eos']
+
+        lines = profiling.dump(str(tmpdir), top=5)
+    finally:
+        profiling.enable([])
+
+    assert sorted(os.listdir(str(tmpdir))) == ['doxymodule.mom_eos.pstats', 'merged.pstats',
+                                               'merged.txt']
+    stats = pstats.Stats(str(tmpdir.join('doxymodule.mom_eos.pstats')))
+    calls = dict((func[2], entry[0]) for func, entry in stats.stats.items())
+    assert calls['work'] == 2
+    assert any('work' in line for line in lines)
+
+
+def test_disabled(tmpdir):
+    profiling.enable([])
+    with profiling.profile('doxymodule', 'mom_eos'):
+        work(10)
+    assert profiling.profiles == {}
+    assert profiling.dump(str(tmpdir)) == []
@@ -0,0 +1,57 @@
+import lxml.etree as ET
+import pytest
+
+from sphinxcontrib.autodoc_doxygen.autosummary import import_by_name, resolve_names
+from doxyproject import doxygen_root
+
+
+XML = '''<root>
+  <compounddef id="namespacemom__eos" kind="namespace">
+    <compoundname>mom_eos</compoundname>
+    <sectiondef kind="func">
+      <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+      <memberdef kind="function" id="namespacemom__eos_1a02"><name>calculate_density</name></memberdef>
+    </sectiondef>
+  </compounddef>
+</root>'''
+
+
+@pytest.fixture
+def root():
+    with doxygen_root(ET.fromstring(XML)) as node:
+        yield node
+
+
+def test_resolve_names(root):
+    names = ['mom_eos', 'calculate_density', 'mom_eos::calculate_density',
+             'mom_eos::calculate_density', 'missing']
+    resolved = resolve_names(names, prefixes=[None, 'mom_eos'])
+
+    assert [name for name, _, _ in resolved] == names
+    assert resolved[0][1][1].get('id') == 'namespacemom__eos'
+    # found with the prefix
+    assert resolved[1][1][0] == 'mom_eos.calculate_density'
+    # consecutive duplicates pick the overloads in turn
+    assert [r[1][1].get('id') for r in resolved[2:4]] == ['namespacemom__eos_1a01',
+                                                          'namespacemom__eos_1a02']
+    assert resolved[4] == ('missing', None, ['missing', 'mom_eos::missing'])
+
+    assert import_by_name('calculate_density', prefixes=['mom_eos'], i=1)[1] is resolved[3][1][1]
+    with pytest.raises(ImportError):
+        import_by_name('missing')
+
+
+def test_resolve_tilde_names(root):
+    # ~name and name count their repeats apart, as with import_by_name per
+    # name; only a run of the same spelling picks the next overload
+    names = ['mom_eos::calculate_density', '~mom_eos::calculate_density',
+             '~mom_eos::calculate_density', 'mom_eos::calculate_density']
+    resolved = resolve_names(names)
+
+    assert [name for name, _, _ in resolved] == ['mom_eos::calculate_density'] * 4
+    assert [r[1][1].get('id') for r in resolved] == ['namespacemom__eos_1a01',
+                                                     'namespacemom__eos_1a01',
+                                                     'namespacemom__eos_1a02',
+                                                     'namespacemom__eos_1a01']
+    assert [r[1][1] for r in resolved] == \
+        [import_by_name(name.lstrip('~'), i=i)[1] for name, i in zip(names, [0, 0, 1, 0])]
@@ -0,0 +1,56 @@
+import os
+
+import lxml.etree as ET
+import pytest
+
+from sphinxcontrib.autodoc_doxygen.autosummary import generate
+from sphinxcontrib.autodoc_doxygen.autosummary.generate import find_autosummary_in_files
+from doxyproject import doxygen_root
+
+
+INDEX = '''Index
+=====
+
+.. autodoxysummary::
+   :toctree: api
+   :generate:
+   :kind: mod
+
+.. autodoxysummary::
+   :template: page.rst
+
+   ~mom_eos::calculate_density
+'''
+
+
+@pytest.fixture
+def root():
+    with doxygen_root(ET.fromstring(
+            '<doxygen><compound kind="namespace"><name>mom_eos</name></compound></doxygen>')) as node:
+        yield node
+
+
+def test_scan_cache(tmpdir, root, monkeypatch):
+    index = tmpdir.join('index.rst')
+    index.write(INDEX)
+    other = tmpdir.join('other.rst')
+    other.write('Nothing here\n')
+    cache = str(tmpdir.join('doctrees', 'autodoc_doxygen.scan'))
+    filenames = [str(index), str(other)]
+
+    items = find_autosummary_in_files(filenames, cache_file=cache)
+    assert items == [('mom_eos', os.path.join(str(tmpdir), 'api'), None),
+                     ('mom_eos::calculate_density', None, 'page.rst')]
+
+    # unchanged files aren't read again, but :kind: follows the XML
+    def fail(filename):
+        raise AssertionError(filename)
+    monkeypatch.setattr(generate, 'scan_autosummary_file', fail)
+    ET.SubElement(ET.SubElement(root, 'compound', kind='namespace'), 'name').text = 'mom_grid'
+    assert [name for name, _, _ in find_autosummary_in_files(filenames, cache_file=cache)] == \
+        ['mom_eos', 'mom_grid', 'mom_eos::calculate_density']
+    monkeypatch.undo()
+
+    other.write('.. autodoxysummary::\n\n   mom_grid\n')
+    os.utime(str(other), (0, 0))
+    assert find_autosummary_in_files(filenames, cache_file=cache)[-1] == ('mom_grid', None, None)
@@ -0,0 +1,121 @@
+import os
+import re
+import sqlite3
+
+import pytest
+from sphinx.errors import ExtensionError
+
+from sphinxcontrib.autodoc_doxygen import sqlstore
+from sphinxcontrib.autodoc_doxygen.sqlstore import SqliteCompounds
+
+
+FILES = {
+    'mom__eos_8F90': '''<compounddef id="mom__eos_8F90" kind="file">
+  <compoundname>MOM_EOS.F90</compoundname>
+  <sectiondef kind="func">
+    <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+  </sectiondef>
+</compounddef>''',
+    'namespacemom__eos': '''<compounddef id="namespacemom__eos" kind="namespace">
+  <compoundname>mom_eos</compoundname>
+  <sectiondef kind="func">
+    <memberdef kind="function" id="namespacemom__eos_1a01"><name>calculate_density</name></memberdef>
+    <memberdef kind="function" id="namespacemom__eos_1a02"><name>calculate_density</name></memberdef>
+  </sectiondef>
+</compounddef>''',
+}
+
+
+def import_files(tmpdir):
+    files = []
+    for refid, xml in sorted(FILES.items()):
+        path = tmpdir.join(refid + '.xml')
+        path.write('<doxygen>%s</doxygen>' % xml)
+        files.append(str(path))
+    db_path = str(tmpdir.join('doctrees', 'autodoc_doxygen.sqlite'))
+    db = sqlstore.connect(db_path)
+    imported = sqlstore.import_xml(db, files)
+    db.close()
+    return db_path, files, imported
+
+
+def test_lookups(tmpdir):
+    db_path, files, imported = import_files(tmpdir)
+    assert imported == 2
+    compounds = SqliteCompounds(db_path, maxsize=1)
+    assert compounds.count() == 2
+    assert [c.get('refid') for c in compounds.index_root()] == ['mom__eos_8F90', 'namespacemom__eos']
+    assert compounds.loaded == {}
+
+    # members are found in the namespace rather than the file listing them
+    assert compounds.compound_of('namespacemom__eos_1a02') == 'namespacemom__eos'
+    assert compounds.compound_of('namespacemom__eos_1a01') == 'namespacemom__eos'
+    assert compounds.compound_of('missing') is None
+    member, = compounds.find_id('namespacemom__eos_1a01')
+    assert member.xpath('./ancestor::compounddef/compoundname')[0].text == 'mom_eos'
+
+    assert [m.get('id') for m in compounds.find_members('mom_eos', 'calculate_density')] == \
+        ['namespacemom__eos_1a01', 'namespacemom__eos_1a02']
+    assert compounds.find_members('mom_eos', 'missing') == []
+    assert compounds.get_by_name('MOM_EOS.F90')[0].get('id') == 'mom__eos_8F90'
+    assert list(compounds.loaded) == ['mom__eos_8F90']
+
+
+def test_reimport(tmpdir):
+    db_path, files, imported = import_files(tmpdir)
+    db = sqlstore.connect(db_path)
+    assert sqlstore.import_xml(db, files) == 0
+
+    with open(files[1], 'w') as f:
+        f.write('<doxygen>%s</doxygen>' % FILES['namespacemom__eos'].replace('mom_eos', 'mom_eos2'))
+    os.utime(files[1], (0, 0))
+    assert sqlstore.import_xml(db, files[1:]) == 1
+    db.close()
+
+    compounds = SqliteCompounds(db_path)
+    assert compounds.count() == 1
+    assert compounds.get_by_name('mom_eos') == []
+    assert compounds.get_by_name('mom_eos2')[0].get('id') == 'namespacemom__eos'
+
+
+def test_index_order(tmpdir):
+    # index.xml doesn't list the modules alphabetically, nor by file name
+    from doxyproject import write_project, build
+    names = ['mom_zeta', 'mom_alpha', 'mom_mid']
+    srcdir = write_project(str(tmpdir), names=names)
+    pages = {}
+    for mode in ('eager', 'sqlite'):
+        outdir = str(tmpdir.join(mode))
+        build(srcdir, outdir, doxygen_xml_mode=mode, doxygen_sqlite_db=str(tmpdir.join('db')))
+        with open(os.path.join(outdir, 'html', 'index.html')) as f:
+            html = f.read()
+        table = html[html.index('<table'):html.index('</table>')]
+        pages[mode] = re.findall(r'<tr.*?(mom_\w+)', table, re.S)
+    assert pages['eager'] == names
+    assert pages['sqlite'] == pages['eager']
+
+
+def test_connect_foreign(tmpdir):
+    # an outdated database of ours is recreated
+    db_path, files, imported = import_files(tmpdir)
+    db = sqlite3.connect(db_path)
+    db.execute("UPDATE meta SET value = '0' WHERE key = 'version'")
+    db.commit()
+    db.close()
+    db = sqlstore.connect(db_path)
+    assert sqlstore.import_xml(db, files) == 2
+    db.close()
+
+    # anything else is left alone
+    other = tmpdir.join('other.sqlite')
+    db = sqlite3.connect(str(other))
+    db.execute('CREATE TABLE notes (text TEXT)')
+    db.commit()
+    db.close()
+    text = tmpdir.join('notes.txt')
+    text.write('not a database, but long enough to have a header\n' * 4)
+    for path in (other, text):
+        content = path.read_binary()
+        with pytest.raises(ExtensionError, match=re.escape(str(path))):
+            sqlstore.connect(str(path))
+        assert path.read_binary() == content
@@ -0,0 +1,28 @@
+import lxml.etree as ET
+
+from sphinxcontrib.autodoc_doxygen.autosummary.summary import first_sentence, join_docstrings, \
+        summarize
+
+
+def test_first_sentence():
+    assert first_sentence(['', 'Computes the density. Then more.', '', 'Details']) == \
+        'Computes the density.'
+    assert first_sentence(['lower case start', 'second line']) == 'lower case start'
+    assert first_sentence(['', '  ']) == ''
+    assert join_docstrings([['a'], [], ['b', '']]) == ['a', '', 'b', '']
+
+
+def test_summarize_function():
+    member = ET.fromstring('''<memberdef kind="function" id="namespacemom__eos_1a01">
+  <definition>subroutine mom_eos::calculate_density</definition>
+  <argsstring>(T, S, rho)</argsstring>
+  <name>calculate_density</name>
+  <briefdescription><para>Calls the <emphasis>right</emphasis> density routine. Really.</para></briefdescription>
+</memberdef>''')
+    assert summarize(member, 'mom_eos.calculate_density', 'html') == \
+        ('(T, S, rho)', 'Calls the *right* density routine.')
+
+    # left to the documenter
+    del member.attrib['id']
+    assert summarize(member, 'mom_eos.calculate_density', 'html') is None
+    assert summarize(ET.fromstring('<memberdef kind="enum"/>'), 'x', 'html') is None
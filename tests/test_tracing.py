@@ -0,0 +1,44 @@
+import json
+import multiprocessing
+
+from sphinxcontrib.autodoc_doxygen import tracing
+
+
+@tracing.traced('square', lambda n: {'n': n})
+def square(n):
+    return n * n
+
+
+def test_disabled():
+    tracing.disable()
+    with tracing.span('load', file='index.xml'):
+        assert square(3) == 9
+    assert tracing.events == []
+
+
+def test_merge_workers(tmpdir):
+    tracing.enable(str(tmpdir.join('_trace')))
+    try:
+        with tracing.span('load', file='index.xml'):
+            square(2)
+        # forked workers write their own events when they exit
+        pool = multiprocessing.get_context('fork').Pool(2)
+        assert pool.map(square, range(4)) == [0, 1, 4, 9]
+        pool.close()
+        pool.join()
+        path = str(tmpdir.join('trace.json'))
+        count = tracing.merge(path)
+    finally:
+        tracing.disable()
+
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    spans = [e for e in events if e['ph'] == 'X']
+    assert count == len(spans) == 6
+    assert [e['name'] for e in spans].count('square') == 5
+    load = [e for e in spans if e['name'] == 'load'][0]
+    assert load['args'] == {'file': 'index.xml'}
+    # one track for this process and at least one for the workers
+    names = [e['args']['name'] for e in events if e['name'] == 'process_name']
+    assert 'sphinx-build' in names and len(names) >= 2
+    assert not tmpdir.join('_trace').check()
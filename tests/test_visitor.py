@@ -0,0 +1,22 @@
+from lxml import etree as ET
+
+from sphinxcontrib.autodoc_doxygen.xmlutils import _DoxygenXmlParagraphFormatter
+
+
+class ShoutingFormatter(_DoxygenXmlParagraphFormatter):
+    def visit_emphasis(self, node):
+        self.para_text(node.text.upper())
+
+
+def test_dispatch():
+    node = ET.fromstring('<detaileddescription><para>a <emphasis>b</emphasis> '
+                         '<unknown>c</unknown></para></detaileddescription>')
+
+    lines = _DoxygenXmlParagraphFormatter().generic_visit(node, build_mode='html').lines
+    assert '*b*' in '\n'.join(lines)
+
+    # subclasses get their own table, unknown tags fall back to generic_visit
+    lines = ShoutingFormatter().generic_visit(node, build_mode='html').lines
+    assert 'B' in '\n'.join(lines)
+    assert '*b*' not in '\n'.join(lines)
+    assert ShoutingFormatter.dispatch_table()['emphasis'] is ShoutingFormatter.visit_emphasis
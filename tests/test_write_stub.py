@@ -0,0 +1,146 @@
+import os
+
+import lxml.etree as ET
+import pytest
+from jinja2 import Template
+
+from sphinxcontrib.autodoc_doxygen.autosummary.generate import write_stub, write_stubs, \
+        stub_digest, read_stub_manifest, write_stub_manifest, make_template_env
+
+
+def test_write_stub(tmpdir):
+    fn = str(tmpdir.join('mom_eos.rst'))
+    write_stub(fn, Template('{{ fullname }}\n{{ underline }}\n'), {'fullname': 'mom_eos', 'underline': '======='},
+               'mom_eos')
+    assert tmpdir.join('mom_eos.rst').read() == 'mom_eos\n======='
+    assert tmpdir.listdir() == [tmpdir.join('mom_eos.rst')]
+
+
+def test_write_stub_failure(tmpdir):
+    fn = str(tmpdir.join('mom_eos.rst'))
+    with pytest.raises(Exception):
+        write_stub(fn, Template('{{ fullname.missing() }}'), {'fullname': 'mom_eos'}, 'mom_eos')
+    # nothing left that would be skipped by the next build
+    assert tmpdir.listdir() == []
+
+
+def test_write_stub_unchanged(tmpdir):
+    fn = str(tmpdir.join('mom_eos.rst'))
+    template = Template('{{ fullname }}')
+    assert write_stub(fn, template, {'fullname': 'mom_eos'}, 'mom_eos')
+    os.utime(fn, (0, 0))
+    assert not write_stub(fn, template, {'fullname': 'mom_eos'}, 'mom_eos')
+    assert os.path.getmtime(fn) == 0
+    assert write_stub(fn, template, {'fullname': 'mom_eos_v2'}, 'mom_eos')
+    assert tmpdir.join('mom_eos.rst').read() == 'mom_eos_v2'
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_write_stubs(tmpdir, workers):
+    from jinja2 import FileSystemLoader
+    templates = tmpdir.mkdir('templates')
+    templates.join('stub.rst').write('{{ fullname }}\n{% for m in methods %}{{ m }}\n{% endfor %}')
+    env = make_template_env(FileSystemLoader([str(templates)]))
+    out = tmpdir.mkdir('out')
+    stubs = [(str(out.join('mod_%d.rst' % m)), 'stub.rst',
+              {'fullname': 'mod_%d' % m, 'methods': ['step', 'init']}, 'mod_%d' % m)
+             for m in range(20)]
+    out.join('mod_3.rst').write('mod_3\nstep\ninit\n')
+
+    written = write_stubs(stubs, env, [str(templates)], workers=workers)
+    assert written == [m != 3 for m in range(20)]
+    assert out.join('mod_7.rst').read() == 'mod_7\nstep\ninit\n'
+
+    # the first failing stub is reported, whatever process rendered it
+    stubs[5] = stubs[5][:2] + ({'methods': None},) + stubs[5][3:]
+    stubs[9] = stubs[9][:1] + ('missing.rst',) + stubs[9][2:]
+    with pytest.raises(TypeError):
+        write_stubs(stubs, env, [str(templates)], workers=workers)
+
+
+def test_stub_manifest(tmpdir):
+    path = str(tmpdir.join('doctrees', 'autodoc_doxygen.stubs'))
+    assert read_stub_manifest(path) == {}
+    entry = {'digest': 'abc', 'name': 'mom_eos', 'sources': ['index.rst']}
+    write_stub_manifest(path, {'api/mom_eos.rst': entry})
+    assert read_stub_manifest(path) == {'api/mom_eos.rst': entry}
+
+    page = ET.fromstring('<compounddef kind="page" id="p"><title>T</title>'
+                         '<detaileddescription><para>Text</para></detaileddescription></compounddef>')
+    digest = stub_digest(page, 'p', '{{ title }}', 'html', 'v1')
+    assert digest == stub_digest(page, 'p', '{{ title }}', 'html', 'v1')
+    assert digest != stub_digest(page, 'p', '{{ title }}!', 'html', 'v1')
+    assert digest != stub_digest(page, 'p', '{{ title }}', 'latexpdf', 'v1')
+    page.find('title').text = 'Other'
+    assert digest != stub_digest(page, 'p', '{{ title }}', 'html', 'v1')
+
+
+def test_main(tmpdir):
+    from sphinxcontrib.autodoc_doxygen.autosummary.generate import main
+    xml_dir = tmpdir.mkdir('xml')
+    xml_dir.join('namespacemom__eos.xml').write(
+        '<doxygen><compounddef id="namespacemom__eos" kind="namespace">'
+        '<compoundname>mom_eos</compoundname></compounddef></doxygen>')
+    xml_dir.join('index.xml').write(
+        '<doxygenindex><compound refid="namespacemom__eos" kind="namespace">'
+        '<name>mom_eos</name></compound></doxygenindex>')
+    src = tmpdir.mkdir('src')
+    src.join('index.rst').write('.. autodoxysummary::\n   :toctree: api\n   :generate:\n   :kind: mod\n')
+    cache_dir = str(tmpdir.join('doctrees'))
+
+    assert main([str(src), str(xml_dir), 'index.rst', '-j', '1', '-d', cache_dir]) == 0
+    assert 'mom_eos' in src.join('api', 'mom_eos.rst').read()
+    assert read_stub_manifest(os.path.join(cache_dir, 'autodoc_doxygen.stubs')).keys() == \
+        {os.path.join('api', 'mom_eos.rst')}
+    assert main([str(src), str(tmpdir.join('missing')), 'index.rst']) == 1
+
+
+def test_main_sqlite(tmpdir):
+    from sphinxcontrib.autodoc_doxygen.autosummary.generate import main
+    from doxyproject import write_project
+    srcdir = write_project(str(tmpdir))
+    xml_dir = str(tmpdir.join('xml'))
+    with pytest.raises(SystemExit):
+        main([srcdir, xml_dir, 'index.rst', '-m', 'sqlite'])
+
+    cache_dir = str(tmpdir.join('doctrees'))
+    assert main([srcdir, xml_dir, 'index.rst', '-j', '2', '-m', 'sqlite', '-d', cache_dir]) == 0
+    assert os.path.exists(os.path.join(cache_dir, 'autodoc_doxygen.sqlite'))
+    assert sorted(os.listdir(os.path.join(srcdir, 'api')))[:2] == ['mod_0.rst', 'mod_1.rst']
+    assert 'mod_3' in open(os.path.join(srcdir, 'api', 'mod_3.rst')).read()
+
+
+def test_main_subset(tmpdir):
+    from sphinxcontrib.autodoc_doxygen.autosummary.generate import main
+    from doxyproject import write_project
+    srcdir = write_project(str(tmpdir), modules=3)
+    xml_dir = str(tmpdir.join('xml'))
+    cache_dir = str(tmpdir.join('doctrees'))
+    other = os.path.join(srcdir, 'other.rst')
+    with open(other, 'w') as f:
+        f.write('.. autodoxysummary::\n   :toctree: other_api\n\n   mod_1\n   mod_2\n')
+
+    assert main([srcdir, xml_dir, 'index.rst', 'other.rst', '-d', cache_dir]) == 0
+    assert sorted(os.listdir(os.path.join(srcdir, 'other_api'))) == ['mod_1.rst', 'mod_2.rst']
+
+    # the stubs of the sources this run doesn't scan are kept
+    assert main([srcdir, xml_dir, 'index.rst', '-d', cache_dir]) == 0
+    assert sorted(os.listdir(os.path.join(srcdir, 'other_api'))) == ['mod_1.rst', 'mod_2.rst']
+
+    # and removed once their source no longer lists them
+    with open(other, 'w') as f:
+        f.write('.. autodoxysummary::\n   :toctree: other_api\n\n   mod_1\n')
+    os.utime(other, (0, 0))
+    assert main([srcdir, xml_dir, 'other.rst', '-d', cache_dir]) == 0
+    assert os.listdir(os.path.join(srcdir, 'other_api')) == ['mod_1.rst']
+    assert os.path.isfile(os.path.join(srcdir, 'api', 'mod_2.rst'))
+
+    # or once their compound is gone
+    os.remove(os.path.join(xml_dir, 'namespacemod__1.xml'))
+    with open(os.path.join(xml_dir, 'index.xml')) as f:
+        index = [line for line in f if 'namespacemod__1' not in line]
+    with open(os.path.join(xml_dir, 'index.xml'), 'w') as f:
+        f.writelines(index)
+    assert main([srcdir, xml_dir, 'index.rst', '-d', cache_dir]) == 0
+    assert os.listdir(os.path.join(srcdir, 'other_api')) == []
+    assert not os.path.exists(os.path.join(srcdir, 'api', 'mod_1.rst'))
@@ -0,0 +1,52 @@
+import os
+
+from sphinxcontrib.autodoc_doxygen import load_doxygen_xml
+
+
+def write_xml(path, name, compoundname):
+    with open(path, 'w') as f:
+        f.write('<doxygen><compounddef id="%s" kind="namespace">'
+                '<compoundname>%s</compoundname></compounddef></doxygen>'
+                % (name, compoundname))
+
+
+def names(root):
+    return [e.text for e in root.findall('./compounddef/compoundname')]
+
+
+def test_cache_hit_and_miss(tmpdir, capsys):
+    files = [str(tmpdir.join('a.xml')), str(tmpdir.join('b.xml'))]
+    write_xml(files[0], 'namespacea', 'a')
+    write_xml(files[1], 'namespaceb', 'b')
+    cache_file = str(tmpdir.join('cache', 'autodoc_doxygen.cache'))
+
+    root = load_doxygen_xml(files, cache_file=cache_file)
+    assert names(root) == ['a', 'b']
+    assert 'cache miss' in capsys.readouterr().out
+    assert os.path.isfile(cache_file)
+
+    root = load_doxygen_xml(files, cache_file=cache_file)
+    assert names(root) == ['a', 'b']
+    assert 'cache hit' in capsys.readouterr().out
+
+    # touching a file without changing it keeps the cache valid
+    st = os.stat(files[0])
+    os.utime(files[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    load_doxygen_xml(files, cache_file=cache_file)
+    assert 'cache hit' in capsys.readouterr().out
+
+    write_xml(files[1], 'namespaceb', 'bb')
+    root = load_doxygen_xml(files, cache_file=cache_file)
+    assert names(root) == ['a', 'bb']
+    assert 'cache miss' in capsys.readouterr().out
+
+    # a removed file invalidates the cache as well
+    root = load_doxygen_xml(files[:1], cache_file=cache_file)
+    assert names(root) == ['a']
+    assert 'cache miss' in capsys.readouterr().out
+
+
+def test_no_cache(tmpdir):
+    path = str(tmpdir.join('a.xml'))
+    write_xml(path, 'namespacea', 'a')
+    assert names(load_doxygen_xml([path])) == ['a']